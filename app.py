@@ -2,35 +2,42 @@ import streamlit as st
 import aiohttp
 import json
 import asyncio
+import contextlib
+import functools
+import time
 import uuid
 from datetime import datetime
 from tools import reserve_table, cancel_reservation, update_reservation, prebook_meal, get_menu, recommend_restaurant
-from data.db import init_db
+from data.db import bootstrap_db
+from runtime import get_http_session, run, iterate
+from data.catalog import start_change_stream_watcher
+from router import fast_route, guess_route, router_stats, RESERVATION_ID_PATTERN
+from prefetch import start_prefetch, prefetch_key, prefetch_stats
+from llm_cache import response_cache, make_cache_key
+from singleflight import llm_flight, singleflight_stats
+from scheduler import get_scheduler, scheduler_stats, parse_retry_after, backoff_delay, GROQ_MAX_RETRIES, RETRYABLE_STATUSES
+from context import estimate_tokens
+from metrics import Trace, span, annotate, record_span, record_llm_attempt, record_llm_usage, start_metrics_server
+from session_store import get_session_store, new_session, is_duplicate_input, record_input
+from prompt import (
+    INTENT_SYSTEM_PROMPT, ROUTING_SYSTEM_PROMPT, RESPONSE_SYSTEM_PROMPT,
+    compact_json, tool_selection_system_prompt, turn_prompt, select_relevant_restaurants,
+)
 import os
 from dotenv import load_dotenv
 import logging
+from logging_setup import setup_logging, clip, category
 
-# Configure logging to write to both file and console
+# Queue-based, rotating, size-bounded logging (see logging_setup.py)
+setup_logging()
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-log_file = "foodiebot.log"
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.INFO)
-file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
 
 load_dotenv()
 groq_api_key = os.getenv('GROQ_API_KEY')
 logger.info(f"GROQ_API_KEY loaded: {'Set' if groq_api_key else 'Not set'}")
 
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
 # Define a list of 20 restaurants with varying cuisines, locations, and seating capacities
 RESTAURANTS = [
     {"id": "R1", "name": "FoodieSpot Downtown French", "cuisine": "french", "location": "Downtown", "seating_capacity": 50},
@@ -109,109 +116,308 @@ TOOLS = [
     }
 ]
 
-async def call_groq_llama(prompt, request_id):
-    if not groq_api_key:
-        logger.error("GROQ_API_KEY is not set. Cannot call Groq API.")
-        return ""
-    
-    logger.info(f"[{request_id}] Calling Groq API for LLaMA inference with prompt: {prompt[:50]}...")
-    try:
-        headers = {"Authorization": f"Bearer {groq_api_key}", "Content-Type": "application/json"}
-        payload = {
-            "model": "llama-3.1-8b-instant",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 300,
-            "temperature": 0.7
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                json=payload,
-                headers=headers
-            ) as response:
+def build_tool_schemas(tools):
+    # Convert the TOOLS list into OpenAI-compatible function-calling schemas
+    schemas = []
+    for tool in tools:
+        properties = {}
+        required = []
+        for param, spec in tool["parameters"].items():
+            properties[param] = {
+                "type": "integer" if spec.startswith("integer") else "string",
+                "description": spec,
+            }
+            if "optional" not in spec:
+                required.append(param)
+        schemas.append({
+            "type": "function",
+            "function": {
+                "name": tool["name"],
+                "description": tool["description"],
+                "parameters": {"type": "object", "properties": properties, "required": required},
+            },
+        })
+    return schemas
+
+TOOL_SCHEMAS = build_tool_schemas(TOOLS)
+# Static prompt prefixes are serialized once, in compact form
+TOOL_SELECTION_SYSTEM_PROMPT = tool_selection_system_prompt(TOOLS)
+TOOL_SCHEMAS_BY_NAME = {schema["function"]["name"]: schema["function"]["parameters"] for schema in TOOL_SCHEMAS}
+
+# Defaults applied to missing required parameters (same values the intent prompt asks the LLM to use)
+TOOL_PARAM_DEFAULTS = {
+    "party_size": 2,
+    "date_time": "2025-05-20T19:00:00Z",
+    "name": "Guest",
+    "phone": "+1234567890",
+}
+
+# "single" routes intent + tool + parameters in one function-calling request;
+# "two_call" keeps the original detect_intent -> select_tool sequence.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "single")
+
+WELCOME_MESSAGE = "Hello! Welcome to FoodieSpot. How can I help you today?"
+
+# When set (e.g. http://localhost:8080), the Streamlit UI forwards messages to server.py
+CHAT_API_URL = os.getenv("CHAT_API_URL")
+
+# Tools whose results reflect live reservation state
+LIVE_DATA_TOOLS = {"reserve_table", "cancel_reservation", "update_reservation", "prebook_meal"}
+
+# Stream the final response stage to the chat UI token by token
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+# Upper bound on tool calls executed for one compound message
+MAX_TOOL_CALLS = int(os.getenv("MAX_TOOL_CALLS", "4"))
+
+# Try the local rule-based router before any LLM routing call
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def validate_tool_call(tool_name, params, request_id):
+    # Returns (cleaned_params, error). Unknown keys are dropped and integer fields coerced.
+    schema = TOOL_SCHEMAS_BY_NAME.get(tool_name)
+    if schema is None:
+        return {}, f"Unknown tool '{tool_name}'"
+    cleaned = {}
+    for param, prop in schema["properties"].items():
+        value = params.get(param)
+        if value is None or value == "":
+            if param in schema["required"] and param in TOOL_PARAM_DEFAULTS:
+                cleaned[param] = TOOL_PARAM_DEFAULTS[param]
+            continue
+        if prop["type"] == "integer":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return {}, f"Invalid value for {param}: {value}"
+        else:
+            value = str(value)
+        cleaned[param] = value
+    missing = [param for param in schema["required"] if param not in cleaned]
+    if missing:
+        logger.warning(f"[{request_id}] Tool {tool_name} is missing required parameters: {missing}")
+    return cleaned, None
+
+def build_groq_request(messages, options):
+    headers = {"Authorization": f"Bearer {groq_api_key}", "Content-Type": "application/json"}
+    payload = {
+        "model": "llama-3.1-8b-instant",
+        "messages": messages,
+        "max_tokens": 300,
+        "temperature": 0.7
+    }
+    payload.update(options)
+    return headers, payload
+
+async def call_groq_chat(messages, request_id, stage=None, **options):
+    # Low-level chat completion call; returns the assistant message dict (or {} on failure).
+    # Extra options (tools, tool_choice, response_format, ...) are passed through in the payload.
+    # `stage` selects the response-cache TTL; stages without a TTL are never cached.
+    with span(f"llm:{stage}"):
+        headers, payload = build_groq_request(messages, options)
+        cache_key = make_cache_key(payload)
+        cached = await response_cache.get(stage, cache_key)
+        if cached is not None:
+            logger.info(f"[{request_id}] LLM cache hit for stage {stage}")
+            annotate(cache_hits=1)
+            return cached
+
+        if not groq_api_key:
+            logger.error("GROQ_API_KEY is not set. Cannot call Groq API.")
+            return {}
+
+        # Identical concurrent requests share one Groq call
+        if llm_flight.in_flight(cache_key):
+            logger.info(f"[{request_id}] Joining in-flight Groq call for stage {stage} (single-flight stats: {singleflight_stats()})")
+            annotate(coalesced=1)
+        return await llm_flight.do(cache_key, post_groq_chat, headers, payload, request_id, stage, cache_key)
+
+@contextlib.asynccontextmanager
+async def groq_response(headers, payload, request_id, stage, prompt_tokens):
+    # Yields a 200 response, or None when the call failed for good. Each attempt waits
+    # for a scheduler slot (priority, rate limits, AIMD concurrency); 429, 5xx and
+    # connection errors are retried with jittered backoff, honouring Retry-After.
+    scheduler = get_scheduler()
+    cost = prompt_tokens + payload.get("max_tokens", 0)
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        if attempt:
+            delay = backoff_delay(attempt - 1, retry_after)
+            scheduler.stats["retries"] += 1
+            logger.warning(f"[{request_id}] Retrying Groq call for stage {stage} in {delay:.2f}s (attempt {attempt + 1}, scheduler: {scheduler_stats()})")
+            await asyncio.sleep(delay)
+        retry_after = None
+        queued_at = time.perf_counter()
+        async with scheduler.slot(stage, cost) as slot:
+            sent_at = time.perf_counter()
+            try:
+                response = await get_http_session().post(GROQ_API_URL, json=payload, headers=headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"[{request_id}] Error calling Groq API: {str(e)}")
+                record_llm_attempt(stage, "error", sent_at - queued_at, time.perf_counter() - sent_at)
+                slot.failed()
+                continue
+            async with response:
                 status = response.status
                 logger.info(f"[{request_id}] API response status: {status}")
-                if status != 200:
-                    logger.error(f"[{request_id}] API call failed with status {status}")
-                    return ""
-                data = await response.json()
-                logger.info(f"[{request_id}] Groq API response data: {data}")
-                return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+                if status == 200:
+                    slot.succeeded()
+                    try:
+                        yield response
+                    finally:
+                        # Network time includes reading (or streaming) the body
+                        record_llm_attempt(stage, status, sent_at - queued_at, time.perf_counter() - sent_at)
+                    return
+                record_llm_attempt(stage, status, sent_at - queued_at, time.perf_counter() - sent_at)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                slot.failed(status, retry_after)
+                logger.error(f"[{request_id}] API call failed with status {status}")
+                if status not in RETRYABLE_STATUSES:
+                    break
+    yield None
+
+async def post_groq_chat(headers, payload, request_id, stage, cache_key):
+    messages = payload["messages"]
+    prompt_tokens = sum(estimate_tokens(msg.get("content") or "") for msg in messages)
+    logger.info(f"[{request_id}] Calling Groq API for LLaMA inference (~{prompt_tokens} prompt tokens) with prompt: {messages[-1]['content'][:50]}...")
+    try:
+        async with groq_response(headers, payload, request_id, stage, prompt_tokens) as response:
+            if response is None:
+                return {}
+            data = await response.json()
+            logger.info(f"[{request_id}] Groq API response data: {clip(data)}", extra=category("llm_payload"))
+            usage = data.get("usage") or {}
+            if usage:
+                logger.info(f"[{request_id}] Token usage: prompt={usage.get('prompt_tokens')}, completion={usage.get('completion_tokens')}")
+                record_llm_usage(stage, usage)
+            message = data.get("choices", [{}])[0].get("message", {}) or {}
+        if message:
+            await response_cache.set(stage, cache_key, message)
+        return message
     except Exception as e:
         logger.error(f"[{request_id}] Error calling Groq API: {str(e)}")
-        return ""
-
-async def detect_intent(user_input, conversation_history, request_id):
-    # Construct the conversation history for context
-    history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
-    
-    prompt = f"""
-You are a conversational AI for FoodieSpot, a restaurant reservation system. Your task is to analyze the user's input and determine their intent and parameters based on the conversation history.
-
-Conversation History:
-{history_text}
-
-Current User Input: "{user_input}"
-
-Available Intents:
-- reserve_table
-- cancel_reservation
-- update_reservation
-- prebook_meal
-- get_menu
-- recommend_restaurant
-
-Return the result in the following JSON format:
-{{
-  "intent": "<intent>",
-  "parameters": {{ "key": "value", ... }}
-}}
-
-If parameters are missing, provide default values where appropriate (e.g., party_size=2, date_time="2025-05-20T19:00:00Z", name="Guest", phone="+1234567890"). Use the conversation history to fill in missing details if possible.
-
-Respond with JSON only, no additional text or explanation.
-"""
-    intent_json = await call_groq_llama(prompt, request_id)
+        return {}
+
+def build_messages(prompt, system=None):
+    # Static system prefix first so provider-side prompt caching can reuse it across calls
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+async def call_groq_llama(prompt, request_id, system=None, stage=None, **options):
+    message = await call_groq_chat(build_messages(prompt, system), request_id, stage=stage, **options)
+    return message.get("content") or ""
+
+async def call_groq_llama_stream(prompt, request_id, system=None, stage=None, **options):
+    # Streaming variant: yields content deltas as they arrive over SSE ("stream": true).
+    # Shares cache entries with the buffered call; a hit is yielded as a single chunk.
+    headers, payload = build_groq_request(build_messages(prompt, system), options)
+    cache_key = make_cache_key(payload)
+    cached = await response_cache.get(stage, cache_key)
+    if cached is not None:
+        logger.info(f"[{request_id}] LLM cache hit for stage {stage}")
+        yield cached.get("content") or ""
+        return
+
+    if not groq_api_key:
+        logger.error("GROQ_API_KEY is not set. Cannot call Groq API.")
+        return
+
+    prompt_tokens = estimate_tokens(prompt)
+    logger.info(f"[{request_id}] Streaming Groq API LLaMA inference (~{prompt_tokens} prompt tokens) with prompt: {prompt[:50]}...")
+    chunks = []
+    try:
+        payload["stream"] = True
+        async with groq_response(headers, payload, request_id, stage, prompt_tokens) as response:
+            if response is None:
+                return
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # Groq reports usage on the final chunk (under x_groq; OpenAI-style at the top level)
+                usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                if usage:
+                    record_llm_usage(stage, usage)
+                delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        if chunks:
+            await response_cache.set(stage, cache_key, {"role": "assistant", "content": "".join(chunks)})
+    except Exception as e:
+        logger.error(f"[{request_id}] Error streaming from Groq API: {str(e)}")
+
+async def detect_intent(user_input, history_text, request_id):
+    prompt = turn_prompt(history_text, [("Current User Input", f'"{user_input}"')])
+    intent_json = await call_groq_llama(prompt, request_id, system=INTENT_SYSTEM_PROMPT, stage="intent")
     try:
         return json.loads(intent_json)
     except json.JSONDecodeError as e:
         logger.error(f"[{request_id}] JSON decode error in intent detection: {str(e)}")
         return {"intent": "unknown", "parameters": {}}
 
-async def select_tool(intent_data, conversation_history, request_id):
-    history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
-    
-    prompt = f"""
-You are a conversational AI for FoodieSpot. Based on the detected intent and conversation history, select the appropriate tool to call and provide the parameters.
-
-Conversation History:
-{history_text}
-
-Detected Intent and Parameters:
-{json.dumps(intent_data, indent=2)}
-
-Available Tools:
-{json.dumps(TOOLS, indent=2)}
-
-Select the appropriate tool and provide the parameters to call it. If the intent is "unknown" or parameters are insufficient, you may choose "recommend_restaurant" to suggest restaurants or respond with an error message.
-
-Return the result in the following JSON format:
-{{
-  "tool": "<tool_name>",
-  "parameters": {{ "key": "value", ... }},
-  "error": "<error_message>" (optional)
-}}
-
-Respond with JSON only, no additional text or explanation.
-"""
-    tool_json = await call_groq_llama(prompt, request_id)
+async def select_tool(intent_data, history_text, request_id):
+    prompt = turn_prompt(history_text, [("Detected Intent and Parameters", compact_json(intent_data))])
+    tool_json = await call_groq_llama(prompt, request_id, system=TOOL_SELECTION_SYSTEM_PROMPT, stage="tool_selection")
     try:
-        return json.loads(tool_json)
+        tool_data = json.loads(tool_json)
     except json.JSONDecodeError as e:
         logger.error(f"[{request_id}] JSON decode error in tool selection: {str(e)}")
         return {"tool": "recommend_restaurant", "parameters": {}, "error": "Failed to select tool due to invalid response format."}
+    if isinstance(tool_data, dict) and "calls" in tool_data and "error" not in tool_data:
+        # Multi-call plan: the first call doubles as the single-tool view, as in route_tool
+        calls = plan_calls(tool_data)
+        if not calls:
+            return {"tool": "recommend_restaurant", "parameters": {}, "error": "Failed to select tool due to invalid response format."}
+        tool_data = dict(calls[0], calls=calls)
+    return tool_data
+
+async def route_tool(user_input, history_text, request_id):
+    # Single LLM round trip: the model picks the tool and fills its arguments via function calling
+    prompt = turn_prompt(history_text, [("Current User Input", f'"{user_input}"')])
+    message = await call_groq_chat(
+        build_messages(prompt, ROUTING_SYSTEM_PROMPT), request_id, stage="routing",
+        tools=TOOL_SCHEMAS, tool_choice="auto"
+    )
+    tool_calls = message.get("tool_calls") or []
+    if not tool_calls:
+        error = (message.get("content") or "").strip() or "Failed to select tool due to invalid response format."
+        return {"intent": "unknown", "parameters": {}}, {"tool": "recommend_restaurant", "parameters": {}, "error": error}
+
+    calls = []
+    for tool_call in tool_calls[:MAX_TOOL_CALLS]:
+        function = tool_call.get("function", {})
+        tool_name = function.get("name")
+        try:
+            arguments = json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError as e:
+            logger.error(f"[{request_id}] JSON decode error in tool routing: {str(e)}")
+            return {"intent": tool_name or "unknown", "parameters": {}}, {"tool": "recommend_restaurant", "parameters": {}, "error": "Failed to select tool due to invalid response format."}
+        params, error = validate_tool_call(tool_name, arguments, request_id)
+        if error:
+            return {"intent": tool_name, "parameters": params}, {"tool": tool_name, "parameters": params, "error": error}
+        calls.append({"tool": tool_name, "parameters": params})
+
+    # The first call doubles as the single-tool view of the plan
+    intent_data = {"intent": calls[0]["tool"], "parameters": calls[0]["parameters"]}
+    tool_data = dict(calls[0], calls=calls)
+    return intent_data, tool_data
+
+def plan_calls(tool_data):
+    # A selection is either a single {"tool", "parameters"} or carries a "calls" list
+    calls = tool_data.get("calls") or [tool_data]
+    return [call for call in calls if isinstance(call, dict) and call.get("tool")][:MAX_TOOL_CALLS]
 
 async def execute_tool(tool_data, request_id):
+    # DB round trips inside are counted against this tool span
+    with span(f"tool:{tool_data.get('tool')}"):
+        return await dispatch_tool(tool_data, request_id)
+
+async def dispatch_tool(tool_data, request_id):
     tool_name = tool_data.get("tool")
     params = tool_data.get("parameters", {})
     logger.info(f"[{request_id}] Executing tool: {tool_name} with parameters: {params}")
@@ -255,114 +461,288 @@ async def execute_tool(tool_data, request_id):
         logger.error(f"[{request_id}] Error executing tool {tool_name}: {str(e)}")
         return f"Error: {str(e)}"
 
-async def generate_response(user_input, conversation_history, tool_result, request_id):
-    history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
-    
-    prompt = f"""
-You are a conversational AI for FoodieSpot, a restaurant reservation system. Based on the conversation history, user input, and the result of a tool execution, generate a natural language response for the user.
-
-Conversation History:
-{history_text}
-
-Current User Input: "{user_input}"
-
-Tool Execution Result:
-{tool_result}
-
-Restaurant List (for reference):
-{json.dumps(RESTAURANTS, indent=2)}
-
-Generate a concise, natural language response to the user. If the tool result contains an error, explain the issue and suggest next steps. If the result is a recommendation, format it nicely and prompt the user to proceed (e.g., "Would you like to reserve a table at one of these?"). Use the conversation history to maintain context and make the response conversational.
-
-Respond with the text response only, no JSON or additional formatting.
-"""
-    response = await call_groq_llama(prompt, request_id)
+async def execute_plan(calls, request_id, prefetch=None):
+    # Read-only calls are independent and run concurrently. Calls that change bookings
+    # run in order as one chain (alongside the reads), and a later call missing a
+    # reservation_id inherits the one produced by an earlier call in the chain.
+    async def run_read(call):
+        nonlocal prefetch
+        if prefetch and prefetch_key(call) == prefetch.key:
+            speculative, prefetch = prefetch, None
+            hit, result = await speculative.consume(call)
+            logger.info(f"[{request_id}] Prefetch {'hit' if hit else 'miss'} (prefetch stats: {prefetch_stats()})")
+            if hit:
+                return result
+        return await execute_tool(call, request_id)
+
+    async def run_chain(chain):
+        results = []
+        last_reservation_id = None
+        for call in chain:
+            params = dict(call.get("parameters") or {})
+            accepts_reservation = "reservation_id" in TOOL_SCHEMAS_BY_NAME.get(call["tool"], {}).get("properties", {})
+            if accepts_reservation and not params.get("reservation_id") and last_reservation_id:
+                params["reservation_id"] = last_reservation_id
+            result = await execute_tool(dict(call, parameters=params), request_id)
+            reservation_ids = RESERVATION_ID_PATTERN.findall(str(result))
+            if reservation_ids:
+                last_reservation_id = reservation_ids[-1]
+            results.append(result)
+        return results
+
+    read_indexes = [i for i, call in enumerate(calls) if call["tool"] not in LIVE_DATA_TOOLS]
+    write_indexes = [i for i, call in enumerate(calls) if call["tool"] in LIVE_DATA_TOOLS]
+    outcomes = await asyncio.gather(
+        *(run_read(calls[i]) for i in read_indexes),
+        run_chain([calls[i] for i in write_indexes])
+    )
+    if prefetch:
+        prefetch.discard()
+        logger.info(f"[{request_id}] Prefetch miss (prefetch stats: {prefetch_stats()})")
+
+    results = [None] * len(calls)
+    for index, result in zip(read_indexes, outcomes[:-1]):
+        results[index] = result
+    for index, result in zip(write_indexes, outcomes[-1]):
+        results[index] = result
+    if len(calls) == 1:
+        return results[0]
+    # One merged result, so a single generate_response call covers the whole plan
+    return "\n".join(f"{call['tool']}: {result}" for call, result in zip(calls, results))
+
+def build_response_prompt(user_input, history_text, tool_result):
+    # Inject only the catalog entries this turn refers to, not the whole restaurant list
+    relevant = select_relevant_restaurants(f"{user_input}\n{tool_result}", RESTAURANTS)
+    return turn_prompt(history_text, [
+        ("Current User Input", f'"{user_input}"'),
+        ("Tool Execution Result", str(tool_result)),
+        ("Restaurant List (for reference)", compact_json(relevant) if relevant else ""),
+    ])
+
+def response_stage(tool_data):
+    # Responses about live booking state use a separate, uncached-by-default stage
+    if any(call["tool"] in LIVE_DATA_TOOLS for call in plan_calls(tool_data)):
+        return "booking_response"
+    return "response"
+
+async def generate_response(user_input, history_text, tool_result, request_id, stage="response"):
+    prompt = build_response_prompt(user_input, history_text, tool_result)
+    response = await call_groq_llama(prompt, request_id, system=RESPONSE_SYSTEM_PROMPT, stage=stage)
     return response.strip()
 
-async def process_input(user_input, request_id):
-    try:
-        # Access conversation history from session state
-        conversation_history = st.session_state.messages
-
+async def generate_response_stream(user_input, history_text, tool_result, request_id, stage="response"):
+    prompt = build_response_prompt(user_input, history_text, tool_result)
+    async for chunk in call_groq_llama_stream(prompt, request_id, system=RESPONSE_SYSTEM_PROMPT, stage=stage):
+        yield chunk
+
+def get_chat_session():
+    # The conversation lives in the shared session store, keyed by the "sid" query
+    # parameter, so a reconnect to any replica (or after a restart) picks it up again.
+    # st.session_state only caches it for the lifetime of this browser connection.
+    if "chat_session" not in st.session_state:
+        session_id = st.query_params.get("sid") or uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+        st.session_state.session_id = session_id
+        st.session_state.chat_session = run_async(get_session_store().load(session_id)) or new_session(WELCOME_MESSAGE)
+    return st.session_state.chat_session
+
+def get_conversation_context():
+    return get_chat_session()["context"]
+
+def render_history(conversation_history, context, request_id):
+    # Callers outside Streamlit (the API server) pass their own history and context
+    if conversation_history is None:
+        conversation_history = get_chat_session()["messages"]
+    if context is None:
+        context = get_conversation_context()
+    history_text = context.render(conversation_history)
+    logger.info(f"[{request_id}] Conversation context tokens: {estimate_tokens(history_text)}")
+    return history_text
+
+async def run_tool_stages(user_input, history_text, request_id):
+    # Steps 1-3 of the pipeline. Returns (tool_data, tool_result, None), or
+    # (tool_data, None, message) when tool selection failed and the message should be
+    # shown to the user as-is.
+    tool_data = fast_route(user_input, RESTAURANTS) if FAST_ROUTER_ENABLED else None
+    prefetch = None
+    run_tool = functools.partial(execute_tool, request_id=request_id)
+    if tool_data:
+        # Fast path: a local rule resolved the tool, so skip the LLM routing stage
+        intent_data = {"intent": tool_data["tool"], "parameters": tool_data["parameters"]}
+        logger.info(f"[{request_id}] Fast-routed tool: {tool_data} (router stats: {router_stats()})")
+    elif PIPELINE_MODE == "two_call":
         # Step 1: Detect intent using LLaMA
-        intent_data = await detect_intent(user_input, conversation_history, request_id)
+        with span("stage:intent"):
+            intent_data = await detect_intent(user_input, history_text, request_id)
         logger.info(f"[{request_id}] Detected intent: {intent_data}")
 
+        # Start the likely read-only DB work while the tool selection call runs
+        prefetch = start_prefetch({"tool": intent_data.get("intent"), "parameters": intent_data.get("parameters", {})}, run_tool)
+
         # Step 2: Select the appropriate tool using LLaMA
-        tool_data = await select_tool(intent_data, conversation_history, request_id)
+        with span("stage:tool_selection"):
+            tool_data = await select_tool(intent_data, history_text, request_id)
         logger.info(f"[{request_id}] Selected tool: {tool_data}")
+    else:
+        # Speculate from a rule-based guess while the routing call runs
+        prefetch = start_prefetch(guess_route(user_input, RESTAURANTS), run_tool)
+
+        # Steps 1+2: Detect intent and select the tool in a single function-calling request
+        with span("stage:routing"):
+            intent_data, tool_data = await route_tool(user_input, history_text, request_id)
+        logger.info(f"[{request_id}] Routed intent: {intent_data}, tool: {tool_data}")
+
+    # Handle errors from tool selection
+    if "error" in tool_data:
+        if prefetch:
+            prefetch.discard()
+        return tool_data, None, f"Sorry, I encountered an issue: {tool_data['error']}. Please try rephrasing your request or ask for recommendations."
+
+    # Step 3: Execute the selected tool(s), reusing the speculative result when it matches
+    with span("stage:tool_execution"):
+        tool_result = await execute_plan(plan_calls(tool_data), request_id, prefetch)
+    logger.info(f"[{request_id}] Tool result: {clip(tool_result)}", extra=category("tool_result"))
+    return tool_data, tool_result, None
+
+async def process_input(user_input, request_id, conversation_history=None, context=None):
+    trace = Trace(request_id)
+    try:
+        with trace.active(), span("stage:turn"):
+            # Budgeted conversation history (recent turns + summary + slots), from session state by default
+            history_text = render_history(conversation_history, context, request_id)
 
-        # Handle errors from tool selection
-        if "error" in tool_data:
-            return f"Sorry, I encountered an issue: {tool_data['error']}. Please try rephrasing your request or ask for recommendations."
-
-        # Step 3: Execute the selected tool
-        tool_result = await execute_tool(tool_data, request_id)
-        logger.info(f"[{request_id}] Tool result: {tool_result}")
+            tool_data, tool_result, error_message = await run_tool_stages(user_input, history_text, request_id)
+            if error_message:
+                return error_message
 
-        # Step 4: Generate a natural language response using LLaMA
-        response = await generate_response(user_input, conversation_history, tool_result, request_id)
-        logger.info(f"[{request_id}] Generated response: {response}")
+            # Step 4: Generate a natural language response using LLaMA
+            with span("stage:response"):
+                response = await generate_response(user_input, history_text, tool_result, request_id, response_stage(tool_data))
+            logger.info(f"[{request_id}] Generated response: {clip(response)}", extra=category("response"))
 
-        return response
+            return response
     except Exception as e:
         logger.error(f"[{request_id}] Error processing input: {str(e)}")
         return f"Sorry, an error occurred: {str(e)}. Please try again."
+    finally:
+        trace.finish()
+
+async def process_input_stream(user_input, request_id, conversation_history=None, context=None):
+    # Same pipeline as process_input, but the final response is yielded chunk by chunk.
+    # The trace is only activated around code without yields (see metrics.Trace.active).
+    trace = Trace(request_id)
+    started = time.perf_counter()
+    try:
+        with trace.active():
+            history_text = render_history(conversation_history, context, request_id)
+            tool_data, tool_result, error_message = await run_tool_stages(user_input, history_text, request_id)
+        if error_message:
+            yield error_message
+            return
+
+        # Step 4: Stream the natural language response from LLaMA
+        chunks = []
+        response_started = time.perf_counter()
+        async for chunk in generate_response_stream(user_input, history_text, tool_result, request_id, response_stage(tool_data)):
+            if not chunks:
+                record_span("stage:first_chunk", time.perf_counter() - started, trace)
+            chunks.append(chunk)
+            yield chunk
+        record_span("stage:response", time.perf_counter() - response_started, trace)
+        logger.info(f"[{request_id}] Generated response: {clip(''.join(chunks))}", extra=category("response"))
+    except Exception as e:
+        logger.error(f"[{request_id}] Error processing input: {str(e)}")
+        yield f"Sorry, an error occurred: {str(e)}. Please try again."
+    finally:
+        record_span("stage:turn", time.perf_counter() - started, trace)
+        trace.finish()
 
-# Helper function to run async tasks in Streamlit
+# Helpers to run async work from Streamlit's script thread. Everything runs on the
+# process-wide background loop, so pooled sessions and caches survive across reruns.
 def run_async(coro):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(coro)
-    loop.close()
-    return result
+    return run(coro)
+
+def run_async_iter(agen):
+    return iterate(agen)
+
+async def stream_from_chat_api(user_input, session_id):
+    # Streamlit as a thin client of server.py: send the message over the WebSocket
+    # endpoint and yield the streamed chunks
+    session = get_http_session()
+    async with session.ws_connect(f"{CHAT_API_URL.rstrip('/')}/ws") as ws:
+        await ws.send_json({"session_id": session_id, "message": user_input})
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            event = json.loads(msg.data)
+            if event["type"] == "chunk":
+                yield event["content"]
+            else:
+                if event["type"] == "error":
+                    yield f"Sorry, the chat service rejected the message: {event.get('error')}"
+                break
+
+@st.cache_resource(show_spinner=False)
+def bootstrap():
+    # Streamlit keeps the result across reruns and browser sessions, so this runs once per
+    # process (failures are not cached and are retried on the next rerun)
+    bootstrap_db()
+    start_change_stream_watcher()
+    start_metrics_server()
+    return True
 
 def main():
     st.title("FoodieSpot Reservation Bot")
     st.write("Chat with our AI to book tables, view menus, or get recommendations!")
 
-    # Initialize MongoDB
-    init_db()
+    # One-time process setup; a no-op on every later rerun
+    bootstrap()
 
-    # Assign a user ID for the session
-    if "user_id" not in st.session_state:
-        st.session_state.user_id = f"U{len(st.session_state.get('messages', [])) + 1}"
+    # Conversation state from the shared session store
+    chat_session = get_chat_session()
 
-    # Chat interface
-    if "messages" not in st.session_state:
-        st.session_state.messages = [{"role": "assistant", "content": "Hello! Welcome to FoodieSpot. How can I help you today?"}]
-
-    for msg in st.session_state.messages:
+    for msg in chat_session["messages"]:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
-    # Use a more robust check to prevent duplicate processing
-    if "last_processed_input" not in st.session_state:
-        st.session_state.last_processed_input = None
-    if "last_processed_time" not in st.session_state:
-        st.session_state.last_processed_time = 0
     if "is_processing" not in st.session_state:
         st.session_state.is_processing = False
-    if "processed_requests" not in st.session_state:
-        st.session_state.processed_requests = set()
 
     user_input = st.chat_input("Type your message...")
     current_time = datetime.now().timestamp()
     request_id = str(uuid.uuid4())
-    if user_input and not st.session_state.is_processing and (user_input != st.session_state.last_processed_input or (current_time - st.session_state.last_processed_time > 2)) and request_id not in st.session_state.processed_requests:
+    if user_input and not st.session_state.is_processing and not is_duplicate_input(chat_session, user_input, current_time):
         st.session_state.is_processing = True
-        st.session_state.last_processed_input = user_input
-        st.session_state.last_processed_time = current_time
-        st.session_state.processed_requests.add(request_id)
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        record_input(chat_session, user_input, current_time)
+        chat_session["messages"].append({"role": "user", "content": user_input})
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        with st.chat_message("assistant"):
-            response = run_async(process_input(user_input, request_id))
-            st.markdown(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
-        st.session_state.is_processing = False
+        # Resolved here: st.session_state is not reachable from the background loop thread
+        conversation_history = chat_session["messages"]
+        context = chat_session["context"]
+        try:
+            with st.chat_message("assistant"):
+                if CHAT_API_URL:
+                    # The API server owns and stores the conversation; this session only renders it
+                    try:
+                        response = st.write_stream(run_async_iter(stream_from_chat_api(user_input, st.session_state.session_id)))
+                    except Exception as e:
+                        logger.error(f"[{request_id}] Chat API request failed: {str(e)}")
+                        response = f"Sorry, the chat service is unavailable: {str(e)}. Please try again."
+                        st.markdown(response)
+                elif STREAM_RESPONSES:
+                    # Render tokens as they arrive; write_stream returns the full text
+                    response = st.write_stream(run_async_iter(process_input_stream(user_input, request_id, conversation_history, context)))
+                else:
+                    response = run_async(process_input(user_input, request_id, conversation_history, context))
+                    st.markdown(response)
+                chat_session["messages"].append({"role": "assistant", "content": response})
+            if not CHAT_API_URL:
+                run_async(get_session_store().save(st.session_state.session_id, chat_session))
+        finally:
+            # Otherwise a failed turn would make this browser session ignore every later message
+            st.session_state.is_processing = False
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
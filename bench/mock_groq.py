@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from aiohttp import web
+from router import guess_route, RESERVATION_ID_PATTERN
+from prompt import INTENT_SYSTEM_PROMPT, TOOL_SELECTION_SYSTEM_TEMPLATE
+
+# Local stand-in for Groq's OpenAI-compatible POST /chat/completions. It recognises
+# the pipeline stage from the request, answers with a plausible message (routing via
+# the scripted `routes` table, else the rule-based router) and injects latency,
+# 429/503 errors and SSE streaming as configured.
+#
+#   python -m bench.mock_groq --port 8099 --latency-ms 300 --error-rate 0.05
+
+INPUT_PATTERN = re.compile(r'Current User Input:\n"(.*)"', re.DOTALL)
+INTENT_PATTERN = re.compile(r"Detected Intent and Parameters:\n(.*?)(?:\n\n|$)", re.DOTALL)
+RESULT_PATTERN = re.compile(r"Tool Execution Result:\n(.*?)(?:\n\n[A-Z][^\n]*:\n|$)", re.DOTALL)
+TOOL_SELECTION_PREFIX = TOOL_SELECTION_SYSTEM_TEMPLATE.split("\n", 1)[0]
+
+def route_key(text):
+    return " ".join(text.lower().split())
+
+class MockGroq:
+    def __init__(self, routes=None, restaurants=(), latency_ms=200.0, jitter_ms=50.0,
+                 error_rate=0.0, retry_after=1.0, chunk_delay_ms=20.0):
+        # routes: {normalized user text: [tool calls]} from the benchmark scenarios
+        self.routes = {route_key(text): calls for text, calls in (routes or {}).items()}
+        self.restaurants = list(restaurants)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.chunk_delay_ms = chunk_delay_ms
+        self.stats = {"requests": 0, "errors": 0, "streams": 0, "by_stage": {}}
+
+    def _calls_for(self, prompt):
+        match = INPUT_PATTERN.search(prompt)
+        user_input = match.group(1) if match else ""
+        calls = self.routes.get(route_key(user_input))
+        if calls is None:
+            guess = guess_route(user_input, self.restaurants)
+            calls = [guess or {"tool": "recommend_restaurant", "parameters": {}}]
+        # "$reservation": the latest reservation id visible in history, as a model would use
+        reservation_ids = RESERVATION_ID_PATTERN.findall(prompt)
+        resolved = []
+        for call in calls:
+            params = {
+                key: (reservation_ids[-1].upper() if reservation_ids else "") if value == "$reservation" else value
+                for key, value in call["parameters"].items()
+            }
+            resolved.append({"tool": call["tool"], "parameters": params})
+        return resolved
+
+    def _message(self, stage, prompt):
+        if stage == "routing":
+            tool_calls = [
+                {"id": f"call_{index}", "type": "function",
+                 "function": {"name": call["tool"], "arguments": json.dumps(call["parameters"])}}
+                for index, call in enumerate(self._calls_for(prompt))
+            ]
+            return {"role": "assistant", "content": None, "tool_calls": tool_calls}
+        if stage == "intent":
+            calls = self._calls_for(prompt)
+            return {"role": "assistant", "content": json.dumps({"intent": calls[0]["tool"], "parameters": calls[0]["parameters"], "calls": calls})}
+        if stage == "tool_selection":
+            match = INTENT_PATTERN.search(prompt)
+            intent = json.loads(match.group(1)) if match else {}
+            calls = intent.get("calls") or [{"tool": intent.get("intent", "recommend_restaurant"), "parameters": intent.get("parameters", {})}]
+            return {"role": "assistant", "content": json.dumps({"calls": calls})}
+        match = RESULT_PATTERN.search(prompt)
+        result = match.group(1).strip() if match else ""
+        return {"role": "assistant", "content": f"Here is what I found: {result} Anything else I can help with?"}
+
+    def _stage(self, payload):
+        system = next((msg["content"] for msg in payload["messages"] if msg["role"] == "system"), "")
+        if payload.get("tools"):
+            return "routing"
+        if system == INTENT_SYSTEM_PROMPT:
+            return "intent"
+        if system.startswith(TOOL_SELECTION_PREFIX):
+            return "tool_selection"
+        return "response"
+
+    async def handle(self, request):
+        payload = await request.json()
+        stage = self._stage(payload)
+        self.stats["requests"] += 1
+        self.stats["by_stage"][stage] = self.stats["by_stage"].get(stage, 0) + 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            if random.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+            return web.Response(status=503)
+
+        prompt = payload["messages"][-1]["content"]
+        message = self._message(stage, prompt)
+        content = message.get("content") or ""
+        usage = {
+            "prompt_tokens": sum(len(msg.get("content") or "") for msg in payload["messages"]) // 4,
+            "completion_tokens": len(content) // 4,
+        }
+        if not payload.get("stream"):
+            return web.json_response({
+                "id": f"mock-{self.stats['requests']}", "object": "chat.completion", "created": int(time.time()),
+                "model": payload.get("model"), "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in re.findall(r"\S+\s*", content):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.chunk_delay_ms / 1000)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+def create_mock_app(mock):
+    app = web.Application()
+    app.router.add_post("/openai/v1/chat/completions", mock.handle)
+    app.router.add_post("/chat/completions", mock.handle)
+    return app
+
+if __name__ == "__main__":
+    from app import RESTAURANTS
+    parser = argparse.ArgumentParser(description="Mock Groq chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    mock = MockGroq(restaurants=RESTAURANTS, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                    error_rate=args.error_rate, chunk_delay_ms=args.chunk_delay_ms)
+    web.run_app(create_mock_app(mock), host=args.host, port=args.port)
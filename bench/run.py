@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+# End-to-end benchmark: N concurrent simulated sessions replay scripted conversations
+# through process_input (or process_input_stream) against the local mock Groq server
+# and a seeded Mongo (a real server via --mongo-uri, or mongomock in memory). Reports
+# throughput and p50/p95/p99 per stage and writes the results as JSON.
+#
+#   python -m bench.run --sessions 20 --scenarios browse,book_and_cancel --output bench.json
+#   python -m bench.run --mongo-uri mongodb://localhost:27017 --mode two_call --stream
+
+STAGES = ("intent", "tool_selection", "routing", "tool_execution", "response", "turn")
+# A tool call did its job only if its result says so; anything else ("Error: ...",
+# "Meal not found.", "No tables available...") makes the turn count as an error
+TOOL_SUCCESS = {
+    "reserve_table": "Table reserved",
+    "update_reservation": "Table reserved",
+    "cancel_reservation": "Reservation canceled.",
+    "prebook_meal": "added to your reservation.",
+    "get_menu": "Menu for",
+    "recommend_restaurant": "Recommended restaurants:",
+}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FoodieSpot end-to-end benchmark")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated sessions")
+    parser.add_argument("--scenarios", default="browse,book_and_cancel,compound", help="comma-separated scenario names")
+    parser.add_argument("--repeat", type=int, default=1, help="times each session replays its scenarios")
+    parser.add_argument("--mode", choices=("single", "two_call"), default="single", help="PIPELINE_MODE")
+    parser.add_argument("--stream", action="store_true", help="use process_input_stream")
+    parser.add_argument("--no-fast-router", action="store_true", help="always route through the LLM")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the in-memory LLM response cache on")
+    parser.add_argument("--rate-limits", action="store_true", help="apply client-side Groq rate limits (free tier unless set in the environment)")
+    parser.add_argument("--mongo-uri", help="seed and use this MongoDB instead of mongomock")
+    parser.add_argument("--no-seed", action="store_true", help="use the existing data as-is")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for generated data and the mock")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mock LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock calls failing with 429/503")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0, help="delay between streamed chunks")
+    parser.add_argument("--mock-port", type=int, default=8099)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    return parser.parse_args(argv)
+
+def configure_environment(args):
+    # Must run before app (and the modules it imports) read their settings
+    os.environ["GROQ_API_KEY"] = "bench"
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{args.mock_port}/openai/v1/chat/completions"
+    os.environ["PIPELINE_MODE"] = args.mode
+    os.environ["FAST_ROUTER_ENABLED"] = "false" if args.no_fast_router else "true"
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+    if args.rate_limits:
+        os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "30")
+        os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "6000")
+    else:
+        os.environ["GROQ_REQUESTS_PER_MINUTE"] = "0"
+        os.environ["GROQ_TOKENS_PER_MINUTE"] = "0"
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+
+def setup_database(args):
+    import metrics  # registers the DB command listener before the client is created
+    from data import db
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed; pip install -r requirements-dev.txt or pass --mongo-uri")
+        db.set_client(mongomock.MongoClient())
+        # mongomock has no topology (and no transactions)
+        db.supports_transactions = lambda: False
+    if not args.no_seed:
+        # In-process (workers=1) so it writes through the client set above; it rebuilds
+        # the indexes of the collections it repopulates
+        from data.generate_data import generate_data
+        generate_data(seed=args.seed)
+    db.bootstrap_db()
+
+def percentile(sorted_values, share):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(share * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples):
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+    }
+
+class StageTimer:
+    # Wraps the app's stage functions in place; they are looked up as module globals
+    # at call time, so the pipeline picks up the timed versions.
+    def __init__(self, app):
+        self.samples = {stage: [] for stage in STAGES}
+        self.samples["first_chunk"] = []
+        # request_id -> [(tool, plan result)] for calls that did not succeed
+        self.tool_failures = {}
+        self._wrap(app, "detect_intent", "intent")
+        self._wrap(app, "select_tool", "tool_selection")
+        self._wrap(app, "route_tool", "routing")
+        self._wrap(app, "execute_plan", "tool_execution")
+        self._wrap(app, "generate_response", "response")
+        self._wrap_stream(app, "generate_response_stream", "response")
+        self._wrap_tools(app)
+
+    def _wrap(self, module, name, stage):
+        original = getattr(module, name)
+
+        @functools.wraps(original)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+        setattr(module, name, timed)
+
+    def _wrap_tools(self, module):
+        # Checks the plan's (merged) result, i.e. what the response stage actually got
+        original = module.execute_plan
+
+        @functools.wraps(original)
+        async def checked(calls, request_id, *args, **kwargs):
+            result = str(await original(calls, request_id, *args, **kwargs))
+            for call in calls:
+                marker = TOOL_SUCCESS.get(call["tool"])
+                if not marker or marker not in result:
+                    self.tool_failures.setdefault(request_id, []).append((call["tool"], result))
+            return result
+        module.execute_plan = checked
+
+    def _wrap_stream(self, module, name, stage):
+        original = getattr(module, name)
+
+        @functools.wraps(original)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                async for chunk in original(*args, **kwargs):
+                    yield chunk
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+        setattr(module, name, timed)
+
+async def run_session(app, timer, session, turns, stream, outcomes):
+    from context import ConversationContext
+    messages = [{"role": "assistant", "content": app.WELCOME_MESSAGE}]
+    context = ConversationContext()
+    for index, turn in enumerate(turns):
+        request_id = f"{session}-{index}"
+        messages.append({"role": "user", "content": turn["text"]})
+        started = time.perf_counter()
+        if stream:
+            chunks = []
+            async for chunk in app.process_input_stream(turn["text"], request_id, messages, context):
+                if not chunks:
+                    timer.samples["first_chunk"].append(time.perf_counter() - started)
+                chunks.append(chunk)
+            response = "".join(chunks)
+        else:
+            response = await app.process_input(turn["text"], request_id, messages, context)
+        timer.samples["turn"].append(time.perf_counter() - started)
+        failed = response.startswith("Sorry") or request_id in timer.tool_failures
+        outcomes["errors" if failed else "ok"] += 1
+        messages.append({"role": "assistant", "content": response})
+
+async def run_benchmark(args):
+    from aiohttp import web
+    import app
+    from bench.mock_groq import MockGroq, create_mock_app
+    from bench.scenarios import script_for, scenario_values
+    from data.db import get_db
+    from prefetch import prefetch_stats
+    from router import router_stats
+    from runtime import close_http_session
+    from scheduler import scheduler_stats
+    from singleflight import singleflight_stats
+    from llm_cache import llm_cache_stats
+    from data.catalog import catalog_cache_stats
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    values = scenario_values(get_db(), args.sessions)
+    scripts = {f"S{index:04d}": script_for(names, f"S{index:04d}", values[index]) * args.repeat for index in range(args.sessions)}
+    routes = {turn["text"]: turn["calls"] for turns in scripts.values() for turn in turns}
+
+    mock = MockGroq(routes, app.RESTAURANTS, args.latency_ms, args.jitter_ms, args.error_rate, chunk_delay_ms=args.chunk_delay_ms)
+    runner = web.AppRunner(create_mock_app(mock))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.mock_port).start()
+
+    timer = StageTimer(app)
+    outcomes = {"ok": 0, "errors": 0}
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            run_session(app, timer, session, turns, args.stream, outcomes)
+            for session, turns in scripts.items()
+        ))
+        elapsed = time.perf_counter() - started
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": vars(args),
+            "elapsed_seconds": round(elapsed, 3),
+            "turns": outcomes["ok"] + outcomes["errors"],
+            "errors": outcomes["errors"],
+            "tool_failures": [
+                {"request_id": request_id, "tool": tool, "result": result[:200]}
+                for request_id, failures in sorted(timer.tool_failures.items())
+                for tool, result in failures
+            ],
+            "throughput_turns_per_second": round((outcomes["ok"] + outcomes["errors"]) / elapsed, 3) if elapsed else None,
+            "stages": {stage: summarize(samples) for stage, samples in timer.samples.items()},
+            "mock_llm": mock.stats,
+            "router": router_stats(),
+            "prefetch": prefetch_stats(),
+            "singleflight": singleflight_stats(),
+            "scheduler": scheduler_stats(),
+            "llm_cache": llm_cache_stats(),
+            "catalog_cache": catalog_cache_stats(),
+        }
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    configure_environment(args)
+    setup_database(args)
+    results = asyncio.run(run_benchmark(args))
+    text = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
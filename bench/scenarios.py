@@ -0,0 +1,95 @@
+# Scripted conversations for the benchmark. Each turn is the user's message plus the
+# tool call the mock LLM should route it to. "{session}" is replaced per simulated
+# session; a "$reservation" parameter is resolved by the mock from the prompt (the
+# reservation id the previous turns produced), as a real model would from history.
+
+# Restaurant ids, cuisines, locations, meals and the booking time are placeholders too,
+# filled from the seeded data by scenario_values: "{restaurant}" (booked, then its
+# "{meal}" pre-booked) and "{other}" (booked, then resized) are different restaurants
+# with a free table for 4 at "{time}", rotated per session so sessions don't compete
+# for the same tables.
+SCENARIOS = {
+    "browse": [
+        {"text": "Can you recommend a {cuisine} restaurant in {location} for 4 people?",
+         "call": {"tool": "recommend_restaurant", "parameters": {"cuisine": "{cuisine}", "location": "{location}", "party_size": 4}}},
+        {"text": "Show me the menu for {restaurant}",
+         "call": {"tool": "get_menu", "parameters": {"restaurant_id": "{restaurant}"}}},
+        {"text": "What about something {other_cuisine} in {other_location}?",
+         "call": {"tool": "recommend_restaurant", "parameters": {"cuisine": "{other_cuisine}", "location": "{other_location}", "party_size": 4}}},
+    ],
+    "book_and_cancel": [
+        {"text": "Book a table at {restaurant} for 4 people at {time}, I'm guest {session}, phone +15550100",
+         "call": {"tool": "reserve_table", "parameters": {"restaurant_id": "{restaurant}", "date_time": "{time}", "party_size": 4,
+                                                          "name": "Guest {session}", "phone": "+15550100", "user_id": "{session}"}}},
+        {"text": "Please pre-book the {meal} for guest {session}",
+         "call": {"tool": "prebook_meal", "parameters": {"reservation_id": "$reservation", "meal_name": "{meal}", "user_id": "{session}"}}},
+        {"text": "Actually, cancel that booking for guest {session}",
+         "call": {"tool": "cancel_reservation", "parameters": {"reservation_id": "$reservation"}}},
+    ],
+    "compound": [
+        {"text": "Show me the menu for {other} and recommend a {other_cuisine} place in {other_location}, guest {session}",
+         "calls": [{"tool": "get_menu", "parameters": {"restaurant_id": "{other}"}},
+                   {"tool": "recommend_restaurant", "parameters": {"cuisine": "{other_cuisine}", "location": "{other_location}", "party_size": 2}}]},
+        {"text": "Book {other} for 2 at {time} for guest {session}, phone +15550101",
+         "call": {"tool": "reserve_table", "parameters": {"restaurant_id": "{other}", "date_time": "{time}", "party_size": 2,
+                                                          "name": "Guest {session}", "phone": "+15550101", "user_id": "{session}"}}},
+        {"text": "Move my booking to 4 people, guest {session}",
+         "call": {"tool": "update_reservation", "parameters": {"reservation_id": "$reservation", "date_time": "{time}",
+                                                               "party_size": 4, "user_id": "{session}"}}},
+    ],
+}
+
+def scenario_values(db, sessions):
+    # One placeholder set per session, from restaurants that have a free table for 4 at
+    # the earliest bookable time and a pre-bookable meal
+    first = db.availability.find_one({"status": "available", "capacity": {"$gte": 4}}, {"date_time": 1}, sort=[("date_time", 1)])
+    if not first:
+        raise RuntimeError("no free tables for 4 in the availability collection; seed the database first")
+    time = first["date_time"]
+    candidate_ids = sorted(db.availability.distinct("restaurant_id", {"date_time": time, "status": "available", "capacity": {"$gte": 4}}))
+    meals = {}
+    for item in db.menu.find({"restaurant_id": {"$in": candidate_ids}, "prebook_allowed": True}, {"_id": 0, "restaurant_id": 1, "name": 1}):
+        meals.setdefault(item["restaurant_id"], item["name"])
+    restaurants = {
+        doc["restaurant_id"]: doc
+        for doc in db.restaurants.find({"restaurant_id": {"$in": list(meals)}}, {"_id": 0, "restaurant_id": 1, "cuisine": 1, "location": 1})
+    }
+    candidates = [restaurants[restaurant_id] for restaurant_id in candidate_ids if restaurant_id in restaurants]
+    if len(candidates) < 2:
+        raise RuntimeError("the benchmark needs at least two restaurants with a free table for 4 and a pre-bookable meal")
+    values = []
+    for index in range(sessions):
+        restaurant = candidates[(2 * index) % len(candidates)]
+        other = candidates[(2 * index + 1) % len(candidates)]
+        values.append({
+            "time": time,
+            "restaurant": restaurant["restaurant_id"],
+            "cuisine": restaurant["cuisine"].lower(),
+            "location": restaurant["location"],
+            "meal": meals[restaurant["restaurant_id"]],
+            "other": other["restaurant_id"],
+            "other_cuisine": other["cuisine"].lower(),
+            "other_location": other["location"],
+        })
+    return values
+
+def _fill(value, values):
+    if isinstance(value, str):
+        for name, replacement in values.items():
+            value = value.replace(f"{{{name}}}", str(replacement))
+        return value
+    if isinstance(value, dict):
+        return {key: _fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, values) for item in value]
+    return value
+
+def script_for(names, session, values):
+    # The concrete turns of one simulated session: [{"text", "calls"}], scenarios in order
+    turns = []
+    values = dict(values, session=session)
+    for name in names:
+        for turn in SCENARIOS[name]:
+            turn = _fill(turn, values)
+            turns.append({"text": turn["text"], "calls": turn.get("calls") or [turn["call"]]})
+    return turns
@@ -0,0 +1,113 @@
+import os
+from router import RESERVATION_ID_PATTERN, RESTAURANT_ID_PATTERN, find_party_size
+
+# Token budget for the conversation history injected into each prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+# Number of most recent turns (user + assistant message pairs) kept verbatim
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "3"))
+# Share of the budget the folded summary may use
+CONTEXT_SUMMARY_SHARE = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.3"))
+# Older messages are folded into the summary as one line of at most this many characters
+SUMMARY_LINE_CHARS = 160
+
+def estimate_tokens(text):
+    # Rough estimate (~4 characters per token for English); good enough for budgeting
+    return max(1, len(text) // 4) if text else 0
+
+def _truncate(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+class ConversationContext:
+    # Keeps the last N turns verbatim, folds older messages into an incrementally
+    # updated summary and carries extracted slots (restaurant_id, reservation_id,
+    # party_size) forward so they survive once their message leaves the window.
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, recent_turns=CONTEXT_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_lines = []
+        self.omitted = 0
+        self.folded = 0
+        self.scanned = 0
+        self.slots = {}
+
+    def _extract_slots(self, msg):
+        content = msg["content"]
+        restaurant_ids = RESTAURANT_ID_PATTERN.findall(content)
+        if restaurant_ids:
+            self.slots["restaurant_id"] = restaurant_ids[-1].upper()
+        reservation_ids = RESERVATION_ID_PATTERN.findall(content)
+        if reservation_ids:
+            self.slots["reservation_id"] = reservation_ids[-1].upper()
+        if msg["role"] == "user":
+            party_size = find_party_size(content)
+            if party_size:
+                self.slots["party_size"] = party_size
+
+    def _fold(self, msg):
+        self.summary_lines.append(f"{msg['role']}: {_truncate(msg['content'], SUMMARY_LINE_CHARS)}")
+        summary_budget = int(self.token_budget * CONTEXT_SUMMARY_SHARE)
+        while len(self.summary_lines) > 1 and estimate_tokens("\n".join(self.summary_lines)) > summary_budget:
+            self.summary_lines.pop(0)
+            self.omitted += 1
+
+    def update(self, messages):
+        for msg in messages[self.scanned:]:
+            self._extract_slots(msg)
+        self.scanned = len(messages)
+
+        cutoff = max(0, len(messages) - self.recent_turns * 2)
+        for msg in messages[self.folded:cutoff]:
+            self._fold(msg)
+        self.folded = max(self.folded, cutoff)
+
+    def _render_parts(self, recent):
+        parts = []
+        if self.summary_lines:
+            header = "Summary of earlier conversation"
+            if self.omitted:
+                header += f" ({self.omitted} older messages omitted)"
+            parts.append(header + ":\n" + "\n".join(self.summary_lines))
+        if self.slots:
+            parts.append("Known details: " + ", ".join(f"{key}={value}" for key, value in sorted(self.slots.items())))
+        parts.append("\n".join(f"{msg['role']}: {msg['content']}" for msg in recent))
+        return "\n\n".join(part for part in parts if part)
+
+    def render(self, messages):
+        # History text for the prompts, kept within the token budget
+        self.update(messages)
+        recent = list(messages[self.folded:])
+        text = self._render_parts(recent)
+        # Over budget: fold more of the verbatim window, but always keep the latest message
+        while len(recent) > 1 and estimate_tokens(text) > self.token_budget:
+            self._fold(recent.pop(0))
+            self.folded += 1
+            text = self._render_parts(recent)
+        return text
+
+    def drop_prefix(self, count):
+        # The caller discarded the first `count` messages; only already-folded ones may go
+        count = min(count, self.folded)
+        self.folded -= count
+        self.scanned = max(0, self.scanned - count)
+        return count
+
+    def to_dict(self):
+        return {
+            "summary": self.summary_lines,
+            "omitted": self.omitted,
+            "folded": self.folded,
+            "scanned": self.scanned,
+            "slots": self.slots,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        context = cls()
+        context.summary_lines = list(data.get("summary", []))
+        context.omitted = data.get("omitted", 0)
+        context.folded = data.get("folded", 0)
+        context.scanned = data.get("scanned", 0)
+        context.slots = dict(data.get("slots", {}))
+        return context
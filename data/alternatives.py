@@ -0,0 +1,103 @@
+import os
+from datetime import datetime, timedelta, timezone
+from data.search import normalize
+
+# Alternative options when a booking finds no free table. Tiers, best first:
+#   1. the same restaurant at the nearest free time
+#   2. another restaurant with the same cuisine at the requested time
+#   3. a restaurant in a nearby location at the requested time
+# Every query is indexed, projected and limited; nothing loads full restaurant documents.
+
+ALTERNATIVES_LIMIT = int(os.getenv("ALTERNATIVES_LIMIT", "3"))
+ALTERNATIVES_WINDOW_HOURS = int(os.getenv("ALTERNATIVES_WINDOW_HOURS", "3"))
+# How many candidate restaurants per tier are checked for a free slot
+ALTERNATIVES_CANDIDATES = int(os.getenv("ALTERNATIVES_CANDIDATES", "25"))
+
+# Neighbouring areas, nearest first
+NEARBY_LOCATIONS = {
+    "downtown": ["midtown", "riverside", "uptown", "suburb"],
+    "midtown": ["downtown", "uptown", "riverside", "suburb"],
+    "uptown": ["midtown", "downtown", "suburb", "riverside"],
+    "riverside": ["downtown", "midtown", "suburb", "uptown"],
+    "suburb": ["uptown", "riverside", "midtown", "downtown"],
+}
+
+CANDIDATE_PROJECTION = {"_id": 0, "restaurant_id": 1, "name": 1, "location": 1}
+
+def _parse(date_time):
+    moment = datetime.fromisoformat(date_time.replace("Z", "+00:00"))
+    # No offset (a common model output) means UTC, like the stored slot times
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def _format(moment):
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _nearest_times(db, restaurant, requested, party_size, limit):
+    window = timedelta(hours=ALTERNATIVES_WINDOW_HOURS)
+    # ISO-8601 UTC strings sort chronologically, so string ranges work on the index;
+    # distinct collapses the per-table slots into one entry per free time
+    times = db.availability.distinct("date_time", {
+        "restaurant_id": restaurant["restaurant_id"],
+        "status": "available",
+        "capacity": {"$gte": party_size},
+        "date_time": {"$gte": _format(requested - window), "$lte": _format(requested + window), "$ne": _format(requested)},
+    })
+    # Nearest first; of two equally near times, the earlier one
+    times = sorted(times, key=lambda value: (abs(_parse(value) - requested), value))
+    return [
+        {"kind": "time", "restaurant_id": restaurant["restaurant_id"], "name": restaurant["name"],
+         "location": restaurant["location"], "date_time": value}
+        for value in times[:limit]
+    ]
+
+def _free_at(db, candidates, date_time, party_size, limit):
+    # Of the candidate restaurants, those with a fitting free slot at the requested time
+    if not candidates:
+        return []
+    by_id = {candidate["restaurant_id"]: candidate for candidate in candidates}
+    free_ids = set(db.availability.distinct("restaurant_id", {
+        "restaurant_id": {"$in": list(by_id)},
+        "date_time": date_time,
+        "status": "available",
+        "capacity": {"$gte": party_size},
+    }))
+    return [by_id[restaurant_id] for restaurant_id in by_id if restaurant_id in free_ids][:limit]
+
+def _candidates(db, query, exclude):
+    query = dict(query, restaurant_id={"$nin": list(exclude)})
+    return list(db.restaurants.find(query, CANDIDATE_PROJECTION).limit(ALTERNATIVES_CANDIDATES))
+
+def find_alternatives(db, restaurant, date_time, party_size, limit=ALTERNATIVES_LIMIT):
+    party_size = int(party_size)
+    try:
+        requested = _parse(date_time)
+    except (AttributeError, ValueError):
+        options = []
+    else:
+        # The other tiers match slots by exact time, in the stored format
+        date_time = _format(requested)
+        options = _nearest_times(db, restaurant, requested, party_size, limit)
+    seen = {restaurant["restaurant_id"]}
+    capacity = {"$gte": party_size}
+
+    if len(options) < limit:
+        query = {"cuisine_norm": normalize(restaurant.get("cuisine")), "max_table_capacity": capacity}
+        for candidate in _free_at(db, _candidates(db, query, seen), date_time, party_size, limit - len(options)):
+            options.append(dict(candidate, kind="cuisine", date_time=date_time))
+            seen.add(candidate["restaurant_id"])
+
+    location = normalize(restaurant.get("location"))
+    for nearby in [location] + NEARBY_LOCATIONS.get(location, []):
+        if len(options) >= limit:
+            break
+        query = {"location_norm": nearby, "max_table_capacity": capacity}
+        for candidate in _free_at(db, _candidates(db, query, seen), date_time, party_size, limit - len(options)):
+            options.append(dict(candidate, kind="location", date_time=date_time))
+            seen.add(candidate["restaurant_id"])
+
+    return options[:limit]
+
+def describe_alternative(option):
+    if option["kind"] == "time":
+        return f"{option['name']} at {option['date_time']}"
+    return f"{option['name']} at {option['location']} ({option['date_time']})"
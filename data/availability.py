@@ -0,0 +1,76 @@
+from pymongo import ReturnDocument, UpdateOne
+
+# One document per (restaurant_id, table_id, date_time) slot:
+# {restaurant_id, table_id, date_time, capacity, price, status, reservation_id}
+# Bookings claim a slot with a single atomic find_one_and_update, so two concurrent
+# requests can never both win the same table.
+
+# Includes _id, which identifies the exact slot document a claim booked
+SLOT_PROJECTION = {"restaurant_id": 1, "table_id": 1, "date_time": 1, "capacity": 1, "price": 1}
+
+def claim_slot(db, restaurant_id, date_time, party_size, reservation_id, session=None, include_own=False):
+    # Books the smallest free table that fits the party; returns the slot or None.
+    # include_own: the slot this reservation already holds counts as free (resizing a booking)
+    query = {
+        "restaurant_id": restaurant_id,
+        "date_time": date_time,
+        "capacity": {"$gte": int(party_size)},
+    }
+    if include_own:
+        query["$or"] = [{"status": "available"}, {"reservation_id": reservation_id}]
+    else:
+        query["status"] = "available"
+    return db.availability.find_one_and_update(
+        query,
+        {"$set": {"status": "booked", "reservation_id": reservation_id}},
+        sort=[("capacity", 1)],
+        projection=SLOT_PROJECTION,
+        # The claim only sets status and reservation_id, neither of which is projected,
+        # so the pre-image is already the claimed slot
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+
+def release_slot(db, restaurant_id, table_id, date_time, reservation_id, session=None):
+    # Slots migrated from the embedded arrays carry no reservation_id, hence the None match
+    return db.availability.update_one(
+        {
+            "restaurant_id": restaurant_id,
+            "table_id": table_id,
+            "date_time": date_time,
+            "status": "booked",
+            "reservation_id": {"$in": [reservation_id, None]},
+        },
+        {"$set": {"status": "available"}, "$unset": {"reservation_id": ""}},
+        session=session,
+    )
+
+def slots_for_tables(restaurant_id, tables):
+    # Expand embedded table availability arrays into slot documents
+    return [
+        {
+            "restaurant_id": restaurant_id,
+            "table_id": table["table_id"],
+            "date_time": avail["date_time"],
+            "capacity": table["capacity"],
+            "price": table["price"],
+            "status": avail["status"],
+        }
+        for table in tables
+        for avail in table.get("availability", [])
+    ]
+
+def migrate_embedded_availability(db, batch_size=1000):
+    # Idempotent copy of restaurants.tables[].availability[] into the availability collection
+    operations = []
+    migrated = 0
+    for restaurant in db.restaurants.find({}, {"_id": 0, "restaurant_id": 1, "tables": 1}):
+        for slot in slots_for_tables(restaurant["restaurant_id"], restaurant.get("tables", [])):
+            key = {name: slot[name] for name in ("restaurant_id", "table_id", "date_time")}
+            operations.append(UpdateOne(key, {"$setOnInsert": slot}, upsert=True))
+            if len(operations) >= batch_size:
+                migrated += db.availability.bulk_write(operations, ordered=False).upserted_count
+                operations = []
+    if operations:
+        migrated += db.availability.bulk_write(operations, ordered=False).upserted_count
+    return migrated
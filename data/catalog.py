@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from data.db import get_db
+from data import search
+from metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Read-through, in-process cache for the (rarely changing) restaurant catalog and menus.
+# Availability is deliberately not cached: table documents are always read from the DB.
+# Each store is a bounded LRU; lookups that found nothing are not cached, so made-up ids
+# (from the LLM or a prefetch guess) never accumulate.
+#
+# Catalog writes reach the cache through the TTL by default. invalidate() drops entries
+# in this process only (generate_data calls it after a reload); the optional change
+# stream below does the same for every replica.
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "10000"))
+CATALOG_QUERY_CACHE_SIZE = int(os.getenv("CATALOG_QUERY_CACHE_SIZE", "1024"))
+# Invalidate from a Mongo change stream (requires a replica set) so replicas see catalog writes
+CATALOG_CHANGE_STREAM = os.getenv("CATALOG_CHANGE_STREAM", "false").lower() in ("1", "true", "yes")
+
+RESTAURANT_PROJECTION = {
+    "_id": 0, "restaurant_id": 1, "name": 1, "cuisine": 1, "location": 1,
+    "seating_capacity": 1, "max_table_capacity": 1, "tables.capacity": 1,
+}
+MENU_PROJECTION = {"_id": 0, "meal_id": 1, "restaurant_id": 1, "name": 1, "category": 1, "price": 1, "prebook_allowed": 1}
+
+_lock = threading.Lock()
+_version = 0
+_restaurants = OrderedDict()
+_menus = OrderedDict()
+_queries = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_watcher = None
+
+def _summarize(doc):
+    # Keep only catalog metadata; table capacities collapse into the largest table size
+    capacities = [table.get("capacity", 0) for table in doc.pop("tables", [])]
+    doc.setdefault("max_table_capacity", max(capacities, default=0))
+    return doc
+
+def _lookup(store, key):
+    entry = store.get(key)
+    if entry is not None:
+        version, loaded_at, value = entry
+        if version == _version and time.monotonic() - loaded_at < CATALOG_CACHE_TTL:
+            store.move_to_end(key)
+            _stats["hits"] += 1
+            record_cache_lookup("catalog", True)
+            return True, value
+        # Expired or loaded before an invalidation
+        del store[key]
+    _stats["misses"] += 1
+    record_cache_lookup("catalog", False)
+    return False, None
+
+def _store(store, key, version, value, max_size=CATALOG_CACHE_SIZE):
+    # Results loaded under an older version, and empty results, are dropped instead of cached
+    if version == _version and value:
+        store[key] = (version, time.monotonic(), value)
+        store.move_to_end(key)
+        while len(store) > max_size:
+            store.popitem(last=False)
+
+def get_restaurant(restaurant_id):
+    with _lock:
+        found, restaurant = _lookup(_restaurants, restaurant_id)
+        version = _version
+    if found:
+        return restaurant
+    doc = get_db().restaurants.find_one({"restaurant_id": restaurant_id}, RESTAURANT_PROJECTION)
+    restaurant = _summarize(doc) if doc else None
+    with _lock:
+        _store(_restaurants, restaurant_id, version, restaurant)
+    return restaurant
+
+def get_menu_items(restaurant_id):
+    with _lock:
+        found, items = _lookup(_menus, restaurant_id)
+        version = _version
+    if found:
+        return items
+    items = list(get_db().menu.find({"restaurant_id": restaurant_id}, MENU_PROJECTION))
+    with _lock:
+        _store(_menus, restaurant_id, version, items)
+    return items
+
+def find_restaurants(cuisine, location, party_size, limit=3):
+    # Query results are cached as restaurant ids and resolved through get_restaurant,
+    # so invalidating one restaurant never serves stale metadata from a cached query.
+    key = ((cuisine or "").lower(), (location or "").lower(), int(party_size or 0), limit)
+    with _lock:
+        found, restaurant_ids = _lookup(_queries, key)
+        version = _version
+    if not found:
+        docs = search.find_restaurants(get_db(), cuisine, location, party_size, limit, RESTAURANT_PROJECTION)
+        restaurants = [_summarize(doc) for doc in docs]
+        restaurant_ids = [restaurant["restaurant_id"] for restaurant in restaurants]
+        with _lock:
+            _store(_queries, key, version, restaurant_ids, CATALOG_QUERY_CACHE_SIZE)
+            for restaurant in restaurants:
+                _store(_restaurants, restaurant["restaurant_id"], version, restaurant)
+    return [restaurant for restaurant in map(get_restaurant, restaurant_ids) if restaurant]
+
+def invalidate(restaurant_id=None):
+    # Drop one restaurant's metadata and menu, or bump the version to drop everything
+    global _version
+    with _lock:
+        _stats["invalidations"] += 1
+        if restaurant_id is None:
+            _version += 1
+            _restaurants.clear()
+            _menus.clear()
+            _queries.clear()
+        else:
+            _restaurants.pop(restaurant_id, None)
+            _menus.pop(restaurant_id, None)
+
+def catalog_version():
+    return _version
+
+def catalog_cache_stats():
+    with _lock:
+        total = _stats["hits"] + _stats["misses"]
+        return dict(_stats, version=_version, hit_rate=_stats["hits"] / total if total else 0.0)
+
+def _watch_changes():
+    pipeline = [{"$match": {"ns.coll": {"$in": ["restaurants", "menu"]}}}]
+    while True:
+        try:
+            with get_db().watch(pipeline, full_document="updateLookup") as stream:
+                for change in stream:
+                    document = change.get("fullDocument") or {}
+                    invalidate(document.get("restaurant_id"))
+        except Exception as e:
+            # Change streams need a replica set; retry slowly and rely on TTL meanwhile
+            logger.warning(f"Catalog change stream unavailable: {str(e)}")
+            time.sleep(30)
+        invalidate()
+
+def start_change_stream_watcher():
+    global _watcher
+    if not CATALOG_CHANGE_STREAM or _watcher is not None:
+        return
+    _watcher = threading.Thread(target=_watch_changes, name="catalog-change-stream", daemon=True)
+    _watcher.start()
@@ -1,27 +1,109 @@
 import pymongo
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import threading
 import os
+from datetime import datetime, timezone
 
 load_dotenv()
 
+# Connection pool settings for the shared, process-wide client
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+DB_NAME = "restaurant_bot"
+# Bump when init_db changes collections, indexes or migrations; deployments whose
+# marker is older run init_db once, everyone else skips it
+SCHEMA_VERSION = 1
+SCHEMA_MARKER_ID = "schema"
+
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+def get_client():
+    # One MongoClient per process: it is thread-safe and owns the connection pool
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv("MONGO_URI"),
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                )
+    return _client
+
+def set_client(client):
+    # Inject a prebuilt client (e.g. a mongomock stand-in for benchmarks) instead of MONGO_URI
+    global _client
+    with _client_lock:
+        _client = client
+
 def get_db():
-    print("db called")
-    client = MongoClient(os.getenv("MONGO_URI"))
-    return client["restaurant_bot"]
+    return get_client()[DB_NAME]
+
+def supports_transactions():
+    # Multi-document transactions need a replica set or sharded cluster
+    client = get_client()
+    return client.topology_description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+def run_write(callback):
+    # Runs callback(session) inside a transaction where supported, otherwise
+    # callback(None) (pymongo accepts session=None, so callers pass it through
+    # unconditionally). with_transaction reruns the whole callback on
+    # TransientTransactionError, e.g. a WriteConflict between two bookings claiming the
+    # same slot, so the retry claims the next free table instead of failing.
+    if not supports_transactions():
+        return callback(None)
+    with get_client().start_session() as session:
+        return session.with_transaction(callback)
+
+def _get_executor():
+    # Worker threads for blocking pymongo calls, sized to match the connection pool
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix="mongo")
+    return _executor
+
+async def run_db(fn, *args, **kwargs):
+    # Run a synchronous pymongo function off the event loop, in a copy of the caller's
+    # context so context variables (e.g. the active metrics span) carry over to the thread
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(context.run, fn, *args, **kwargs))
+
+def close_db():
+    global _client, _executor
+    with _client_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        if _client is not None:
+            _client.close()
+            _client = None
 
 def init_db():
     db = get_db()
     # Create collections if they don't exist
     collections = db.list_collection_names()
-    if "restaurants" not in collections:
-        db.create_collection("restaurants")
-    if "reservations" not in collections:
-        db.create_collection("reservations")
-    if "menu" not in collections:
-        db.create_collection("menu")
-    if "users" not in collections:
-        db.create_collection("users")
+    for name in ("restaurants", "reservations", "menu", "users", "availability"):
+        if name not in collections:
+            try:
+                db.create_collection(name)
+            except CollectionInvalid:
+                # Another replica created it in the meantime
+                pass
 
     # Ensure indexes for performance
     db.restaurants.create_index([("restaurant_id", 1)], unique=True)
@@ -33,3 +115,36 @@ def init_db():
     db.menu.create_index([("restaurant_id", 1)])
     db.users.create_index([("user_id", 1)], unique=True)
     db.users.create_index([("reservations.reservation_id", 1)])
+    # Slot lookups: equality on restaurant/time/status, then range + sort on capacity
+    db.availability.create_index([("restaurant_id", 1), ("date_time", 1), ("status", 1), ("capacity", 1)])
+    db.availability.create_index([("restaurant_id", 1), ("table_id", 1), ("date_time", 1)], unique=True)
+
+    # One-time data migrations
+    from data.availability import migrate_embedded_availability
+    from data.search import create_search_indexes, backfill_search_fields
+    create_search_indexes(db)
+    if db.availability.estimated_document_count() == 0:
+        migrate_embedded_availability(db)
+    if db.restaurants.find_one({"name_norm": {"$exists": False}}, {"_id": 1}) or db.menu.find_one({"name_norm": {"$exists": False}}, {"_id": 1}):
+        backfill_search_fields(db)
+
+def bootstrap_db(force=False):
+    # Schema setup once per process, and only when the deployment's version marker in
+    # the meta collection is behind SCHEMA_VERSION: one find_one instead of a dozen
+    # admin round trips. Replicas racing on a stale marker all run the idempotent init_db.
+    global _bootstrapped
+    if _bootstrapped and not force:
+        return
+    with _bootstrap_lock:
+        if _bootstrapped and not force:
+            return
+        db = get_db()
+        marker = db.meta.find_one({"_id": SCHEMA_MARKER_ID}, {"version": 1})
+        if force or not marker or marker.get("version", 0) < SCHEMA_VERSION:
+            init_db()
+            db.meta.update_one(
+                {"_id": SCHEMA_MARKER_ID},
+                {"$max": {"version": SCHEMA_VERSION}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        _bootstrapped = True
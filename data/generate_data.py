@@ -1,57 +1,242 @@
-from db import get_db
-from datetime import datetime
+import argparse
+import json
+import multiprocessing
+import os
 import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 
-def generate_data():
-    db = get_db()
-    # Only drop collections that we will repopulate
-    db.restaurants.drop()
-    db.menu.drop()
-
-    locations = ["Downtown", "Suburb", "Midtown", "Uptown", "Riverside"]
-    cuisines = ["Italian", "Mexican", "Chinese", "Indian", "American", "French", "Japanese", "Thai", "Mediterranean", "BBQ"]
-    menu_items = {
-        "Italian": [("Pizza", "main", 15.99, True), ("Pasta", "main", 12.99, True), ("Tiramisu", "dessert", 6.99, True)],
-        "Mexican": [("Tacos", "main", 10.99, True), ("Guacamole", "starter", 7.99, False), ("Churros", "dessert", 5.99, True)],
-        "Chinese": [("Dumplings", "starter", 8.99, True), ("Kung Pao Chicken", "main", 14.99, True), ("Mango Pudding", "dessert", 5.99, True)],
-        "Indian": [("Butter Chicken", "main", 13.99, True), ("Naan", "side", 3.99, False), ("Gulab Jamun", "dessert", 4.99, True)],
-        "American": [("Burger", "main", 11.99, True), ("Fries", "side", 4.99, False), ("Milkshake", "dessert", 6.99, True)],
-        "French": [("Croissant", "starter", 4.99, False), ("Coq au Vin", "main", 16.99, True), ("Creme Brulee", "dessert", 7.99, True)],
-        "Japanese": [("Sushi", "main", 18.99, True), ("Miso Soup", "starter", 3.99, False), ("Mochi", "dessert", 5.99, True)],
-        "Thai": [("Pad Thai", "main", 12.99, True), ("Spring Rolls", "starter", 6.99, True), ("Mango Sticky Rice", "dessert", 6.99, True)],
-        "Mediterranean": [("Hummus", "starter", 7.99, True), ("Falafel", "main", 10.99, True), ("Baklava", "dessert", 5.99, True)],
-        "BBQ": [("Ribs", "main", 19.99, True), ("Coleslaw", "side", 4.99, False), ("Brownie", "dessert", 5.99, True)]
+# Runnable from anywhere (python data/generate_data.py) as well as importable as data.generate_data
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from data.db import get_db, close_db, bootstrap_db
+from data import catalog
+from data.search import restaurant_search_fields, menu_search_fields
+
+# Synthetic catalog: restaurants with tables, menus and one availability slot per
+# (table, date_time). Every restaurant is built from its own seeded RNG, so the
+# dataset is identical for any chunk size or number of worker processes.
+#
+#   python data/generate_data.py                                   # 50 restaurants, one 19:00 slot
+#   python data/generate_data.py --restaurants 100000 --days 14 --slots-per-day 6 \
+#       --first-slot 17:00 --workers 8
+#   python data/generate_data.py --backend jsonl --output-dir generated   # for mongoimport
+
+LOCATIONS = ["Downtown", "Suburb", "Midtown", "Uptown", "Riverside"]
+CUISINES = ["Italian", "Mexican", "Chinese", "Indian", "American", "French", "Japanese", "Thai", "Mediterranean", "BBQ"]
+MENU_ITEMS = {
+    "Italian": [("Pizza", "main", 15.99, True), ("Pasta", "main", 12.99, True), ("Tiramisu", "dessert", 6.99, True)],
+    "Mexican": [("Tacos", "main", 10.99, True), ("Guacamole", "starter", 7.99, False), ("Churros", "dessert", 5.99, True)],
+    "Chinese": [("Dumplings", "starter", 8.99, True), ("Kung Pao Chicken", "main", 14.99, True), ("Mango Pudding", "dessert", 5.99, True)],
+    "Indian": [("Butter Chicken", "main", 13.99, True), ("Naan", "side", 3.99, False), ("Gulab Jamun", "dessert", 4.99, True)],
+    "American": [("Burger", "main", 11.99, True), ("Fries", "side", 4.99, False), ("Milkshake", "dessert", 6.99, True)],
+    "French": [("Croissant", "starter", 4.99, False), ("Coq au Vin", "main", 16.99, True), ("Creme Brulee", "dessert", 7.99, True)],
+    "Japanese": [("Sushi", "main", 18.99, True), ("Miso Soup", "starter", 3.99, False), ("Mochi", "dessert", 5.99, True)],
+    "Thai": [("Pad Thai", "main", 12.99, True), ("Spring Rolls", "starter", 6.99, True), ("Mango Sticky Rice", "dessert", 6.99, True)],
+    "Mediterranean": [("Hummus", "starter", 7.99, True), ("Falafel", "main", 10.99, True), ("Baklava", "dessert", 5.99, True)],
+    "BBQ": [("Ribs", "main", 19.99, True), ("Coleslaw", "side", 4.99, False), ("Brownie", "dessert", 5.99, True)]
+}
+GENERIC_MENU = [("Generic Dish", "main", 10.99, True)]
+
+COLLECTIONS = ("restaurants", "menu", "availability")
+
+def slot_times(start_date, days, slots_per_day, first_slot, slot_minutes):
+    # ISO-8601 UTC strings, the format the availability collection is queried with
+    hour, minute = (int(part) for part in first_slot.split(":"))
+    start = datetime.combine(date.fromisoformat(start_date), datetime.min.time(), tzinfo=timezone.utc)
+    start += timedelta(hours=hour, minutes=minute)
+    return [
+        (start + timedelta(days=day, minutes=slot * slot_minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for day in range(days)
+        for slot in range(slots_per_day)
+    ]
+
+def build_restaurant(index, seed, times, booked_share=0.0):
+    # Returns (restaurant, menu items, availability slots) for restaurant number `index`
+    rng = random.Random(f"{seed}:{index}")
+    cuisine = rng.choice(CUISINES)
+    location = rng.choice(LOCATIONS)
+    restaurant_id = f"R{index + 1}"
+    tables = [
+        {
+            "table_id": f"T{j + 1}",
+            "capacity": rng.choice([2, 4, 6, 8]),
+            "price": rng.choice([2, 4, 6, 8]) * 2.0,  # $2 per person
+        } for j in range(rng.randint(5, 15))
+    ]
+    restaurant = {
+        "restaurant_id": restaurant_id,
+        "name": f"FoodieSpot {location} {cuisine}",
+        "location": location,
+        "cuisine": cuisine,
+        "seating_capacity": sum(table["capacity"] for table in tables),
+        "tables": tables
     }
+    restaurant.update(restaurant_search_fields(restaurant))
 
-    for i in range(50):
-        cuisine = random.choice(cuisines)
-        location = random.choice(locations)
-        restaurant_id = f"R{i+1}"
-        tables = [
-            {
-                "table_id": f"T{j+1}",
-                "capacity": random.choice([2, 4, 6, 8]),
-                "price": random.choice([2, 4, 6, 8]) * 2.0,  # $2 per person
-                "availability": [{"date_time": "2025-05-20T19:00:00Z", "status": "available"}]
-            } for j in range(random.randint(5, 15))
-        ]
-        db.restaurants.insert_one({
+    menu = []
+    for name, category, price, prebook in MENU_ITEMS.get(cuisine, GENERIC_MENU):
+        item = {
+            "meal_id": f"M{restaurant_id}{name}",
             "restaurant_id": restaurant_id,
-            "name": f"FoodieSpot {location} {cuisine}",
-            "location": location,
-            "cuisine": cuisine,
-            "seating_capacity": sum(t["capacity"] for t in tables),
-            "tables": tables
-        })
-        for name, category, price, prebook in menu_items.get(cuisine, [("Generic Dish", "main", 10.99, True)]):
-            db.menu.insert_one({
-                "meal_id": f"M{restaurant_id}{name}",
-                "restaurant_id": restaurant_id,
-                "name": name,
-                "category": category,
-                "price": price,
-                "prebook_allowed": prebook
-            })
+            "name": name,
+            "category": category,
+            "price": price,
+            "prebook_allowed": prebook
+        }
+        item.update(menu_search_fields(item))
+        menu.append(item)
+
+    # Same document shape as data.availability.slots_for_tables
+    slots = [
+        {
+            "restaurant_id": restaurant_id,
+            "table_id": table["table_id"],
+            "date_time": date_time,
+            "capacity": table["capacity"],
+            "price": table["price"],
+            "status": "booked" if booked_share and rng.random() < booked_share else "available",
+        }
+        for table in tables
+        for date_time in times
+    ]
+    return restaurant, menu, slots
+
+class MongoWriter:
+    # Buffers documents per collection and writes them with unordered insert_many batches
+    def __init__(self, db, batch_size):
+        self.db = db
+        self.batch_size = batch_size
+        self.buffers = {name: [] for name in COLLECTIONS}
+
+    def add(self, collection, docs):
+        buffer = self.buffers[collection]
+        buffer.extend(docs)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection)
+
+    def flush(self, collection):
+        buffer = self.buffers[collection]
+        if buffer:
+            self.db[collection].insert_many(buffer, ordered=False)
+            buffer.clear()
+
+    def close(self):
+        for collection in COLLECTIONS:
+            self.flush(collection)
+
+class JsonlWriter:
+    # One file per collection and chunk, in mongoimport's JSON-lines format
+    def __init__(self, output_dir, part):
+        os.makedirs(output_dir, exist_ok=True)
+        self.files = {
+            name: open(os.path.join(output_dir, f"{name}-{part:07d}.jsonl"), "w")
+            for name in COLLECTIONS
+        }
+
+    def add(self, collection, docs):
+        self.files[collection].writelines(json.dumps(doc) + "\n" for doc in docs)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+def write_chunk(config, start, stop):
+    # Builds and writes restaurants [start, stop); runs in-process or in a worker process
+    times = slot_times(config["start_date"], config["days"], config["slots_per_day"], config["first_slot"], config["slot_minutes"])
+    if config["backend"] == "jsonl":
+        writer = JsonlWriter(config["output_dir"], start)
+    else:
+        writer = MongoWriter(get_db(), config["batch_size"])
+    counts = dict.fromkeys(COLLECTIONS, 0)
+    try:
+        for index in range(start, stop):
+            restaurant, menu, slots = build_restaurant(index, config["seed"], times, config["booked_share"])
+            for collection, docs in (("restaurants", [restaurant]), ("menu", menu), ("availability", slots)):
+                writer.add(collection, docs)
+                counts[collection] += len(docs)
+    finally:
+        writer.close()
+    return counts
+
+def _write_chunk_in_worker(config, start, stop):
+    try:
+        return write_chunk(config, start, stop)
+    finally:
+        # Worker processes own their client; don't leave its pool open
+        close_db()
+
+def generate_data(restaurants=50, days=1, slots_per_day=1, start_date="2025-05-20", first_slot="19:00",
+                  slot_minutes=60, seed=42, booked_share=0.0, backend="mongo", output_dir="generated",
+                  workers=1, batch_size=5000, chunk_size=1000):
+    config = {
+        "start_date": start_date, "days": days, "slots_per_day": slots_per_day, "first_slot": first_slot,
+        "slot_minutes": slot_minutes, "seed": seed, "booked_share": booked_share, "backend": backend,
+        "output_dir": output_dir, "batch_size": batch_size,
+    }
+    if backend == "mongo":
+        db = get_db()
+        # Only drop collections that we will repopulate
+        for collection in COLLECTIONS:
+            db[collection].drop()
+
+    chunks = [(start, min(start + chunk_size, restaurants)) for start in range(0, restaurants, chunk_size)]
+    totals = dict.fromkeys(COLLECTIONS, 0)
+    if workers > 1:
+        # Spawned, not forked: MongoClient is not fork-safe, so each worker connects itself
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_write_chunk_in_worker, config, start, stop) for start, stop in chunks]
+            for future in futures:
+                for collection, count in future.result().items():
+                    totals[collection] += count
+    else:
+        for start, stop in chunks:
+            for collection, count in write_chunk(config, start, stop).items():
+                totals[collection] += count
+
+    if backend == "mongo":
+        # Indexes are (re)built once after the bulk load, which is faster than maintaining
+        # them during it; the dropped collections lost theirs anyway
+        bootstrap_db(force=True)
+        # Drop this process's cached catalog; other processes pick the reload up via the TTL
+        catalog.invalidate()
+    return totals
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic FoodieSpot catalog")
+    parser.add_argument("--restaurants", type=int, default=50)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--slots-per-day", type=int, default=1)
+    parser.add_argument("--start-date", default="2025-05-20", help="first day, YYYY-MM-DD (UTC)")
+    parser.add_argument("--first-slot", default="19:00", help="time of the first slot each day, HH:MM (UTC)")
+    parser.add_argument("--slot-minutes", type=int, default=60, help="minutes between slots")
+    parser.add_argument("--booked-share", type=float, default=0.0, help="share of slots generated as already booked")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("mongo", "jsonl"), default="mongo")
+    parser.add_argument("--uri", help="MongoDB URI (default: MONGO_URI)")
+    parser.add_argument("--output-dir", default="generated", help="directory for the jsonl backend")
+    parser.add_argument("--workers", type=int, default=1, help="parallel worker processes")
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="restaurants per work unit")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    generate_data()
\ No newline at end of file
+    args = parse_args()
+    if args.uri:
+        # Read by get_db here and in spawned workers
+        os.environ["MONGO_URI"] = args.uri
+    started = time.perf_counter()
+    totals = generate_data(
+        restaurants=args.restaurants, days=args.days, slots_per_day=args.slots_per_day,
+        start_date=args.start_date, first_slot=args.first_slot, slot_minutes=args.slot_minutes,
+        seed=args.seed, booked_share=args.booked_share, backend=args.backend, output_dir=args.output_dir,
+        workers=args.workers, batch_size=args.batch_size, chunk_size=args.chunk_size,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Generated {totals['restaurants']} restaurants, {totals['menu']} menu items and "
+          f"{totals['availability']} availability slots in {elapsed:.1f}s")
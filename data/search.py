@@ -0,0 +1,98 @@
+import os
+import re
+from pymongo import UpdateOne
+
+# Normalized search fields maintained at write time, so restaurant and meal lookups can
+# use exact and anchored-prefix index scans instead of unanchored case-insensitive regexes.
+#   restaurants: cuisine_norm, location_norm, name_norm, max_table_capacity
+#   menu:        name_norm
+
+# Fuzzy meal-name matching through a text index on menu.name
+MENU_TEXT_SEARCH = os.getenv("MENU_TEXT_SEARCH", "true").lower() in ("1", "true", "yes")
+
+def normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+def normalize_restaurant_id(value):
+    # Restaurant ids are stored upper-case ("R4") and looked up case-sensitively
+    return str(value or "").strip().upper()
+
+def restaurant_search_fields(restaurant):
+    return {
+        "cuisine_norm": normalize(restaurant.get("cuisine")),
+        "location_norm": normalize(restaurant.get("location")),
+        "name_norm": normalize(restaurant.get("name")),
+        "max_table_capacity": max((table.get("capacity", 0) for table in restaurant.get("tables", [])), default=0),
+    }
+
+def menu_search_fields(item):
+    return {"name_norm": normalize(item.get("name"))}
+
+def create_search_indexes(db):
+    db.restaurants.create_index([("cuisine_norm", 1), ("location_norm", 1), ("max_table_capacity", 1)])
+    db.restaurants.create_index([("location_norm", 1), ("max_table_capacity", 1)])
+    db.menu.create_index([("restaurant_id", 1), ("name_norm", 1)])
+    if MENU_TEXT_SEARCH:
+        db.menu.create_index([("restaurant_id", 1), ("name", "text")])
+
+def backfill_search_fields(db, batch_size=1000):
+    # Adds the normalized fields to documents written before they existed
+    for collection, projection, fields_for in (
+        (db.restaurants, {"name": 1, "cuisine": 1, "location": 1, "tables.capacity": 1}, restaurant_search_fields),
+        (db.menu, {"name": 1}, menu_search_fields),
+    ):
+        operations = []
+        for doc in collection.find({"name_norm": {"$exists": False}}, projection):
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields_for(doc)}))
+            if len(operations) >= batch_size:
+                collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+def _prefix(value):
+    # Anchored, case-sensitive regex on a lowercase field can use the index as a range scan
+    return {"$regex": "^" + re.escape(normalize(value))}
+
+def find_restaurants(db, cuisine, location, party_size, limit, projection):
+    capacity = {"$gte": int(party_size or 0)}
+    exact = {"max_table_capacity": capacity}
+    prefix = {"max_table_capacity": capacity}
+    if cuisine:
+        exact["cuisine_norm"] = normalize(cuisine)
+        prefix["cuisine_norm"] = _prefix(cuisine)
+    if location:
+        exact["location_norm"] = normalize(location)
+        prefix["location_norm"] = _prefix(location)
+
+    docs = list(db.restaurants.find(exact, projection).limit(limit))
+    if not docs and (cuisine or location):
+        docs = list(db.restaurants.find(prefix, projection).limit(limit))
+    if not docs:
+        # Original behaviour: substring match on the raw fields (collection scan)
+        docs = list(db.restaurants.find({
+            "cuisine": {"$regex": re.escape(cuisine or ""), "$options": "i"},
+            "location": {"$regex": re.escape(location or ""), "$options": "i"},
+            "tables.capacity": capacity
+        }, projection).limit(limit))
+    return docs
+
+def find_meal(db, restaurant_id, meal_name):
+    name = normalize(meal_name)
+    meal = db.menu.find_one({"restaurant_id": restaurant_id, "name_norm": name})
+    if not meal:
+        meal = db.menu.find_one({"restaurant_id": restaurant_id, "name_norm": _prefix(name)})
+    if not meal and MENU_TEXT_SEARCH:
+        try:
+            meal = db.menu.find_one(
+                {"restaurant_id": restaurant_id, "$text": {"$search": meal_name}},
+                {"score": {"$meta": "textScore"}, "name": 1, "prebook_allowed": 1},
+                sort=[("score", {"$meta": "textScore"})]
+            )
+        except Exception:
+            # Text index not created (yet); fall through to the regex lookup
+            meal = None
+    if not meal:
+        # Original behaviour: unanchored, case-insensitive regex on the raw name
+        meal = db.menu.find_one({"name": {"$regex": re.escape(meal_name), "$options": "i"}, "restaurant_id": restaurant_id})
+    return meal
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from data.db import get_db, run_db
+from metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "mongo" (shared across replicas) or "none"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_COLLECTION = os.getenv("LLM_CACHE_COLLECTION", "llm_cache")
+
+# TTL in seconds per pipeline stage; 0 means the stage is never cached.
+# Responses to booking tools describe live reservation state, so they are excluded by default.
+STAGE_TTLS = {
+    "intent": 600,
+    "tool_selection": 600,
+    "routing": 600,
+    "response": 300,
+    "booking_response": 0,
+}
+for _stage in STAGE_TTLS:
+    _override = os.getenv(f"LLM_CACHE_TTL_{_stage.upper()}")
+    if _override is not None:
+        STAGE_TTLS[_stage] = int(_override)
+for _stage in filter(None, os.getenv("LLM_CACHE_EXCLUDE_STAGES", "").split(",")):
+    STAGE_TTLS[_stage.strip()] = 0
+
+def normalize_text(text):
+    # Collapse whitespace and case so trivially different prompts share an entry
+    return " ".join((text or "").split()).lower()
+
+def make_cache_key(payload):
+    # Hash of the normalized messages plus model and every other request parameter
+    key_data = {name: value for name, value in payload.items() if name not in ("messages", "stream")}
+    key_data["messages"] = [[msg["role"], normalize_text(msg.get("content"))] for msg in payload["messages"]]
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class MemoryCacheBackend:
+    blocking = False
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class MongoCacheBackend:
+    # Shared across replicas; expiry is enforced on read and by a TTL index
+    blocking = True
+
+    def __init__(self, collection_name=LLM_CACHE_COLLECTION):
+        self.collection_name = collection_name
+        self.indexed = False
+
+    def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self.indexed:
+            collection.create_index([("expires_at", 1)], expireAfterSeconds=0)
+            self.indexed = True
+        return collection
+
+    def get(self, key):
+        doc = self._collection().find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"value": 1}
+        )
+        return doc["value"] if doc else None
+
+    def set(self, key, value, ttl):
+        self._collection().update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def enabled(self, stage):
+        return self.backend is not None and STAGE_TTLS.get(stage, 0) > 0
+
+    def _record(self, stage, outcome):
+        with self.stats_lock:
+            stage_stats = self.stats.setdefault(stage, {"hits": 0, "misses": 0})
+            stage_stats[outcome] += 1
+        record_cache_lookup("llm", outcome == "hits", stage)
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await run_db(fn, *args)
+        return fn(*args)
+
+    async def get(self, stage, key):
+        if not self.enabled(stage):
+            return None
+        try:
+            value = await self._call(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {str(e)}")
+            value = None
+        self._record(stage, "hits" if value is not None else "misses")
+        return value
+
+    async def set(self, stage, key, value):
+        if not self.enabled(stage):
+            return
+        try:
+            await self._call(self.backend.set, key, value, STAGE_TTLS[stage])
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+
+    def snapshot(self):
+        with self.stats_lock:
+            result = {}
+            for stage, stage_stats in self.stats.items():
+                total = stage_stats["hits"] + stage_stats["misses"]
+                result[stage] = dict(stage_stats, hit_rate=stage_stats["hits"] / total if total else 0.0)
+            return result
+
+def _create_backend(name):
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "mongo":
+        return MongoCacheBackend()
+    return None
+
+response_cache = ResponseCache(_create_backend(LLM_CACHE_BACKEND))
+
+def llm_cache_stats():
+    return response_cache.snapshot()
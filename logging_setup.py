@@ -0,0 +1,126 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Process-wide logging. Callers only put records on a bounded in-memory queue; a
+# listener thread does the file and console I/O, so the event loop never blocks on
+# log writes. Records are size-bounded and, per category, sampled before queueing;
+# when the listener falls behind and the queue is full, new records are dropped and counted.
+#
+# Categories are passed as logger.info(..., extra=category("llm_payload")); records
+# without one (and anything at WARNING or above) are never sampled out.
+
+LOG_FILE = os.getenv("LOG_FILE", "foodiebot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Records waiting for the listener thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Hard cap on any single log message
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# Payloads (LLM responses, tool results, generated replies) are clipped to this length
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "300"))
+# Debug setting: log payloads in full, unsampled and untruncated
+LOG_FULL_PAYLOADS = os.getenv("LOG_FULL_PAYLOADS", "false").lower() in ("1", "true", "yes")
+
+# Share of INFO/DEBUG records kept per category; override with e.g.
+# LOG_SAMPLE_RATES="llm_payload=0.05,tool_result=0.5"
+DEFAULT_SAMPLE_RATES = {"llm_payload": 0.1, "tool_result": 1.0, "response": 1.0}
+LOG_SAMPLE_RATES = dict(DEFAULT_SAMPLE_RATES)
+for _entry in filter(None, os.getenv("LOG_SAMPLE_RATES", "").split(",")):
+    _name, _, _rate = _entry.partition("=")
+    LOG_SAMPLE_RATES[_name.strip()] = float(_rate)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+def category(name):
+    return {"category": name}
+
+def clip(value, limit=LOG_PAYLOAD_CHARS):
+    # Bounded text for a payload in a log line (in full when LOG_FULL_PAYLOADS is set)
+    text = str(value)
+    if LOG_FULL_PAYLOADS or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+class BoundedSampledFilter(logging.Filter):
+    def filter(self, record):
+        if LOG_FULL_PAYLOADS:
+            return True
+        if record.levelno < logging.WARNING:
+            rate = LOG_SAMPLE_RATES.get(getattr(record, "category", None), 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+        message = record.getMessage()
+        if len(message) > LOG_MAX_MESSAGE_CHARS:
+            record.msg = clip(message, LOG_MAX_MESSAGE_CHARS)
+            record.args = None
+        return True
+
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record):
+        # Called under the handler lock, so the counter needs no lock of its own
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Blocks until the listener makes room, rather than failing on a full queue
+        self.queue.put(self._sentinel)
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+def setup_logging():
+    # Idempotent: Streamlit re-executes app.py on every rerun, but this module (and the
+    # handlers it installs) is only set up once per process
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            return
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+        console_handler = logging.StreamHandler()
+        for handler in (file_handler, console_handler):
+            handler.setFormatter(formatter)
+
+        _queue_handler = BoundedQueueHandler(LOG_QUEUE_SIZE)
+        _queue_handler.addFilter(BoundedSampledFilter())
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_queue_handler)
+
+        _listener = DrainingQueueListener(_queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    # Flush the queue, then write directly so records logged later in shutdown still land
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            handler.addFilter(BoundedSampledFilter())
+            root.addHandler(handler)
+        _listener = _queue_handler = None
+
+def logging_stats():
+    handler = _queue_handler
+    if handler is None:
+        return {}
+    return {"queued": handler.queue.qsize(), "dropped": handler.dropped}
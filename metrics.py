@@ -0,0 +1,263 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Structured timing for a turn. Spans ("stage:routing", "llm:response", "tool:get_menu")
+# nest through a context variable, so they follow the turn across awaits, tasks and
+# run_db worker threads. Every span feeds a latency histogram; LLM calls add
+# queue/network time and provider token usage, and a pymongo command listener counts
+# DB round trips against the enclosing tool span. Everything is exported in the
+# Prometheus text format; a per-request trace can additionally be dumped as JSON.
+
+# "" (off), "log" (one JSON log line per request) or a directory for <request_id>.json
+METRICS_TRACE_DUMP = os.getenv("METRICS_TRACE_DUMP", "")
+# Standalone /metrics endpoint for the Streamlit process (server.py serves its own)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _label_text(labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{{{_label_text(key)}}} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{{{_label_text(key + (('le', bound),))}}} {cumulative}")
+                lines.append(f"{self.name}_sum{{{_label_text(key)}}} {total}")
+                lines.append(f"{self.name}_count{{{_label_text(key)}}} {cumulative}")
+        return lines
+
+SPAN_SECONDS = Histogram("foodiebot_span_seconds", "Duration of pipeline spans (stages, LLM calls, tools).")
+LLM_QUEUE_SECONDS = Histogram("foodiebot_llm_queue_seconds", "Time Groq requests waited for a scheduler slot.")
+LLM_NETWORK_SECONDS = Histogram("foodiebot_llm_network_seconds", "Time from sending a Groq request to finishing its response.")
+LLM_REQUESTS = Counter("foodiebot_llm_requests_total", "Groq HTTP attempts by stage and status.")
+LLM_TOKENS = Counter("foodiebot_llm_tokens_total", "Provider-reported Groq token usage.")
+DB_COMMAND_SECONDS = Histogram("foodiebot_db_command_seconds", "MongoDB command round-trip time.")
+DB_ROUND_TRIPS = Counter("foodiebot_db_round_trips_total", "MongoDB round trips by enclosing tool.")
+CACHE_LOOKUPS = Counter("foodiebot_cache_lookups_total", "LLM response and catalog cache lookups by outcome.")
+METRICS = [SPAN_SECONDS, LLM_QUEUE_SECONDS, LLM_NETWORK_SECONDS, LLM_REQUESTS, LLM_TOKENS, DB_COMMAND_SECONDS, DB_ROUND_TRIPS, CACHE_LOOKUPS]
+
+class Span:
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = dict(attrs)
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, key, amount):
+        # Counters on a span may be bumped from run_db worker threads
+        with self.lock:
+            self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def tool(self):
+        span = self
+        while span is not None and not span.name.startswith("tool:"):
+            span = span.parent
+        return span.name[len("tool:"):] if span else "none"
+
+class Trace:
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        # Only around code without yields: a context variable set inside an async
+        # generator does not survive to its next step
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def record(self, name, duration, attrs):
+        with self.lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((time.perf_counter() - duration - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                **attrs,
+            })
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "request_id": self.request_id,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+            }
+
+    def finish(self):
+        if not METRICS_TRACE_DUMP:
+            return
+        data = self.to_dict()
+        try:
+            if METRICS_TRACE_DUMP == "log":
+                logger.info(f"[{self.request_id}] Trace: {json.dumps(data)}")
+            else:
+                os.makedirs(METRICS_TRACE_DUMP, exist_ok=True)
+                with open(os.path.join(METRICS_TRACE_DUMP, f"{self.request_id}.json"), "w") as f:
+                    json.dump(data, f, indent=2)
+        except OSError as e:
+            logger.error(f"[{self.request_id}] Failed to dump trace: {str(e)}")
+
+def record_span(name, duration, trace=None, **attrs):
+    # For timings that cannot use span(), e.g. across the yields of a streamed response
+    SPAN_SECONDS.observe(duration, span=name)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.record(name, duration, attrs)
+
+@contextmanager
+def span(name, **attrs):
+    current = Span(name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        with current.lock:
+            attrs = dict(current.attrs)
+        record_span(name, time.perf_counter() - current.started, **attrs)
+
+def annotate(**attrs):
+    # Add counters to the innermost active span, if any
+    current = _current_span.get()
+    if current is not None:
+        for key, amount in attrs.items():
+            current.add(key, amount)
+
+def record_llm_attempt(stage, status, queue_seconds, network_seconds):
+    LLM_REQUESTS.inc(stage=stage, status=status)
+    LLM_QUEUE_SECONDS.observe(queue_seconds, stage=stage)
+    LLM_NETWORK_SECONDS.observe(network_seconds, stage=stage)
+    annotate(queue_ms=round(queue_seconds * 1000, 2), network_ms=round(network_seconds * 1000, 2), attempts=1)
+
+def record_cache_lookup(cache, hit, stage=""):
+    CACHE_LOOKUPS.inc(cache=cache, stage=stage, outcome="hit" if hit else "miss")
+
+def record_llm_usage(stage, usage):
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    LLM_TOKENS.inc(prompt_tokens, stage=stage, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, stage=stage, type="completion")
+    annotate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+class CommandMetrics(monitoring.CommandListener):
+    # Events are published on the thread that ran the command; run_db copies the
+    # caller's context into its worker thread, so the enclosing span is visible here
+    def started(self, event):
+        pass
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        DB_COMMAND_SECONDS.observe(seconds, command=event.command_name)
+        current = _current_span.get()
+        DB_ROUND_TRIPS.inc(tool=current.tool() if current else "none")
+        if current is not None:
+            current.add("db_round_trips", 1)
+            current.add("db_ms", round(seconds * 1000, 3))
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+# Applies to every MongoClient created after this module is imported
+monitoring.register(CommandMetrics())
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT):
+    # Idempotent, so it is safe to call from every Streamlit rerun
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+            logger.info(f"Serving Prometheus metrics on port {port}")
+        return _metrics_server
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import time
+from data.search import normalize_restaurant_id
+
+# Speculative execution of read-only tools. As soon as a likely tool call is known
+# (from detect_intent, or from a low-confidence router guess), its DB reads start in
+# the background while the next LLM stage runs. execute_tool then consumes the result
+# if the final tool call matches; otherwise the speculative task is discarded.
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Only tools without side effects may run speculatively
+PREFETCHABLE_TOOLS = {
+    "get_menu": ("restaurant_id",),
+    "recommend_restaurant": ("cuisine", "location", "party_size"),
+}
+
+_stats = {"started": 0, "hits": 0, "misses": 0, "overlap_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def _record(outcome, overlap=0.0):
+    with _stats_lock:
+        _stats[outcome] += 1
+        _stats["overlap_seconds"] += overlap
+
+def prefetch_stats():
+    with _stats_lock:
+        finished = _stats["hits"] + _stats["misses"]
+        return dict(_stats, hit_rate=_stats["hits"] / finished if finished else 0.0)
+
+def prefetch_key(tool_data):
+    tool_name = (tool_data or {}).get("tool")
+    if tool_name not in PREFETCHABLE_TOOLS:
+        return None
+    params = tool_data.get("parameters") or {}
+    values = []
+    for param in PREFETCHABLE_TOOLS[tool_name]:
+        value = params.get(param)
+        if param == "restaurant_id":
+            # Ids are case-sensitive; the speculative call runs with this same value
+            values.append(normalize_restaurant_id(value))
+        else:
+            values.append("" if value is None else str(value).strip().lower())
+    return (tool_name,) + tuple(values)
+
+class Prefetch:
+    def __init__(self, key, task):
+        self.key = key
+        self.task = task
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self.finished_at = time.monotonic()
+
+    def discard(self):
+        if not self.task.done():
+            self.task.cancel()
+        _record("misses")
+
+    async def consume(self, tool_data):
+        # Returns (True, result) when the speculative call matches the final one
+        if prefetch_key(tool_data) != self.key:
+            self.discard()
+            return False, None
+        consumed_at = time.monotonic()
+        result = await self.task
+        # Time the DB work ran hidden behind other stages
+        overlap = min(self.finished_at or consumed_at, consumed_at) - self.started_at
+        _record("hits", max(0.0, overlap))
+        return True, result
+
+def start_prefetch(tool_data, runner):
+    # runner(tool_data) is the coroutine function that executes the tool
+    if not PREFETCH_ENABLED:
+        return None
+    key = prefetch_key(tool_data)
+    if key is None:
+        return None
+    params = dict(tool_data.get("parameters") or {})
+    if "restaurant_id" in params:
+        params["restaurant_id"] = normalize_restaurant_id(params["restaurant_id"])
+    with _stats_lock:
+        _stats["started"] += 1
+    return Prefetch(key, asyncio.ensure_future(runner(dict(tool_data, parameters=params))))
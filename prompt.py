@@ -1,3 +1,6 @@
+import json
+from router import find_cuisines, find_locations, find_restaurant_ids
+
 # INTENT_PROMPT = """
 # You are an AI assistant for a restaurant reservation system. Given the user input, identify the intent and extract relevant parameters. Return a JSON object with:
 # - intent: one of ["reserve_table", "cancel_reservation", "update_reservation", "prebook_meal", "get_menu", "recommend_restaurant"]
@@ -29,4 +32,75 @@ Return the result in the following format:
 Possible intents: reserve_table, cancel_reservation, update_reservation, prebook_meal, get_menu, recommend_restaurant
 
 note - result should be in JSON format only, no other text or explanation required.
-"""
\ No newline at end of file
+"""
+
+# Prompt templates used by app.py. Every prompt is laid out as a static system prefix
+# (identical on every call, so provider-side prefix/KV caching can reuse it), followed
+# by the dynamic conversation history and finally the current turn's input.
+
+# Maximum number of catalog entries injected into the response prompt
+RELEVANT_RESTAURANTS_LIMIT = 5
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"))
+
+INTENT_SYSTEM_PROMPT = """You are a conversational AI for FoodieSpot, a restaurant reservation system. Your task is to analyze the user's input and determine their intent and parameters based on the conversation history.
+
+Available Intents: reserve_table, cancel_reservation, update_reservation, prebook_meal, get_menu, recommend_restaurant
+
+Return the result in the following JSON format:
+{"intent": "<intent>", "parameters": {"key": "value", ...}}
+
+If parameters are missing, provide default values where appropriate (e.g., party_size=2, date_time="2025-05-20T19:00:00Z", name="Guest", phone="+1234567890"). Use the conversation history to fill in missing details if possible.
+
+Respond with JSON only, no additional text or explanation."""
+
+TOOL_SELECTION_SYSTEM_TEMPLATE = """You are a conversational AI for FoodieSpot. Based on the detected intent and conversation history, select the appropriate tool to call and provide the parameters.
+
+Available Tools:
+{tools_json}
+
+Select the appropriate tool and provide the parameters to call it. If the intent is "unknown" or parameters are insufficient, you may choose "recommend_restaurant" to suggest restaurants or respond with an error message.
+
+Return the result in the following JSON format:
+{"tool": "<tool_name>", "parameters": {"key": "value", ...}, "error": "<error_message>" (optional)}
+
+If the user asks for several things in one message, return every tool call in order instead:
+{"calls": [{"tool": "<tool_name>", "parameters": {"key": "value", ...}}, ...]}
+
+Respond with JSON only, no additional text or explanation."""
+
+ROUTING_SYSTEM_PROMPT = """You are a conversational AI for FoodieSpot, a restaurant reservation system. Based on the conversation history and the user's input, call the tool that fulfils the request. If the user asks for several things in one message, call one tool per request, in the order they should happen.
+
+If parameters are missing, provide default values where appropriate (e.g., party_size=2, date_time="2025-05-20T19:00:00Z", name="Guest", phone="+1234567890"). Use the conversation history to fill in missing details if possible. If the intent is unclear, call recommend_restaurant; if no tool fits at all, reply with a short error message instead of calling a tool."""
+
+RESPONSE_SYSTEM_PROMPT = """You are a conversational AI for FoodieSpot, a restaurant reservation system. Based on the conversation history, user input, and the result of a tool execution, generate a natural language response for the user.
+
+Generate a concise, natural language response to the user. If the tool result contains an error, explain the issue and suggest next steps. If the result is a recommendation, format it nicely and prompt the user to proceed (e.g., "Would you like to reserve a table at one of these?"). Use the conversation history to maintain context and make the response conversational.
+
+Respond with the text response only, no JSON or additional formatting."""
+
+def tool_selection_system_prompt(tools):
+    # Serialized once at startup; str.replace avoids escaping the JSON braces in the template
+    return TOOL_SELECTION_SYSTEM_TEMPLATE.replace("{tools_json}", compact_json(tools))
+
+def turn_prompt(history_text, sections):
+    # Dynamic part of a prompt: history first, then the current turn's (title, body) sections
+    parts = [f"Conversation History:\n{history_text}"]
+    parts += [f"{title}:\n{body}" for title, body in sections if body]
+    return "\n\n".join(parts)
+
+def select_relevant_restaurants(text, restaurants, limit=RELEVANT_RESTAURANTS_LIMIT):
+    # Only the catalog entries the turn refers to (by id/name, cuisine or location)
+    text = text.lower()
+    ids = set(find_restaurant_ids(text, restaurants))
+    cuisines = set(find_cuisines(text, restaurants))
+    locations = set(find_locations(text, restaurants))
+    scored = []
+    for index, restaurant in enumerate(restaurants):
+        score = 3 * (restaurant["id"] in ids)
+        score += restaurant["cuisine"].lower() in cuisines
+        score += restaurant["location"] in locations
+        if score:
+            scored.append((-score, index, restaurant))
+    return [restaurant for _, _, restaurant in sorted(scored)[:limit]]
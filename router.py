@@ -0,0 +1,133 @@
+import re
+import threading
+
+# Deterministic fast path for simple, predictable requests. When a rule matches with
+# confidence, the tool call is built locally and the LLM routing stage is skipped;
+# anything ambiguous returns None so the caller falls back to the LLM.
+
+# Current ids are RES + 24 hex characters; older ones are RES + a numeric timestamp
+RESERVATION_ID_PATTERN = re.compile(r"\bRES[0-9A-F]{8,}\b", re.IGNORECASE)
+RESTAURANT_ID_PATTERN = re.compile(r"\bR\d+\b", re.IGNORECASE)
+PARTY_SIZE_PATTERN = re.compile(
+    r"\b(?:for|party of)\s+(\d{1,2})\b(?!\s*(?:am|pm|:|o'?clock))"
+    r"|\b(\d{1,2})\s+(?:people|persons|guests|diners|pax)\b",
+    re.IGNORECASE,
+)
+
+CANCEL_WORDS = ("cancel",)
+MENU_WORDS = ("menu",)
+RECOMMEND_WORDS = ("recommend", "suggest", "looking for", "where can i eat", "where should i eat")
+
+# Phrases that usually mean a compound, negated or stateful request the rules can't resolve
+FALLBACK_WORDS = (
+    " and ", " but ", " not ", "n't", " instead", " except", " without",
+    " other than", " besides", " apart from", " rather than", " excluding", " avoid",
+    " no ", " never", " dislike", " hate ", " tired of",
+    "book", "reserve", "change", "update", "move", "prebook", "pre-book", "order",
+)
+
+DEFAULT_PARTY_SIZE = 2
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+def _record(hit):
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+def router_stats():
+    with _stats_lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "hit_rate": _stats["hits"] / total if total else 0.0,
+        }
+
+def _contains_word(text, word):
+    return re.search(rf"\b{re.escape(word)}\b", text) is not None
+
+def find_cuisines(text, restaurants):
+    return sorted({r["cuisine"].lower() for r in restaurants if _contains_word(text, r["cuisine"].lower())})
+
+def find_locations(text, restaurants):
+    return sorted({r["location"] for r in restaurants if _contains_word(text, r["location"].lower())})
+
+def find_restaurant_ids(text, restaurants):
+    # Explicit ids ("R4") first, then full restaurant names
+    known_ids = {r["id"].upper() for r in restaurants}
+    ids = [match.upper() for match in RESTAURANT_ID_PATTERN.findall(text) if match.upper() in known_ids]
+    if not ids:
+        ids = [r["id"] for r in restaurants if r["name"].lower() in text]
+    return sorted(set(ids))
+
+def find_reservation_ids(text):
+    return sorted({match.upper() for match in RESERVATION_ID_PATTERN.findall(text)})
+
+def find_party_size(text):
+    match = PARTY_SIZE_PATTERN.search(text)
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+def _match(text, restaurants, strict=True):
+    families = [
+        words for words in (CANCEL_WORDS, MENU_WORDS, RECOMMEND_WORDS)
+        if any(word in text for word in words)
+    ]
+    # Exactly one intent family must be present; everything else goes to the LLM
+    if len(families) != 1:
+        return None
+    family = families[0]
+    fallback_words = FALLBACK_WORDS
+    if family is CANCEL_WORDS:
+        # "cancel my booking RES..." legitimately mentions bookings
+        fallback_words = tuple(word for word in FALLBACK_WORDS if word not in ("book", "reserve"))
+    if strict and any(word in text for word in fallback_words):
+        return None
+
+    if family is CANCEL_WORDS:
+        reservation_ids = find_reservation_ids(text)
+        if len(reservation_ids) != 1:
+            return None
+        return {"tool": "cancel_reservation", "parameters": {"reservation_id": reservation_ids[0]}}
+
+    if family is MENU_WORDS:
+        restaurant_ids = find_restaurant_ids(text, restaurants)
+        if not restaurant_ids:
+            # "menu at the midtown italian place": accept only if cuisine + location pick one restaurant
+            cuisines = find_cuisines(text, restaurants)
+            locations = find_locations(text, restaurants)
+            candidates = [
+                r["id"] for r in restaurants
+                if (not cuisines or r["cuisine"].lower() in cuisines)
+                and (not locations or r["location"] in locations)
+            ]
+            if (cuisines or locations) and len(candidates) == 1:
+                restaurant_ids = candidates
+        if len(restaurant_ids) != 1:
+            return None
+        return {"tool": "get_menu", "parameters": {"restaurant_id": restaurant_ids[0]}}
+
+    cuisines = find_cuisines(text, restaurants)
+    locations = find_locations(text, restaurants)
+    if len(cuisines) > 1 or len(locations) > 1 or find_restaurant_ids(text, restaurants):
+        return None
+    params = {"party_size": find_party_size(text) or DEFAULT_PARTY_SIZE}
+    if cuisines:
+        params["cuisine"] = cuisines[0]
+    if locations:
+        params["location"] = locations[0]
+    return {"tool": "recommend_restaurant", "parameters": params}
+
+def fast_route(user_input, restaurants):
+    # Returns {"tool": ..., "parameters": ...} when a rule matches confidently, else None
+    text = f" {user_input.strip().lower()} "
+    tool_data = _match(text, restaurants)
+    _record(tool_data is not None)
+    return tool_data
+
+def guess_route(user_input, restaurants):
+    # Low-confidence guess (compound/negated phrasing allowed) used only for speculative
+    # prefetching; never executed without the LLM agreeing. Not counted in router_stats.
+    return _match(f" {user_input.strip().lower()} ", restaurants, strict=False)
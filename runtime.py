@@ -0,0 +1,108 @@
+import aiohttp
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from data.db import close_db
+
+logger = logging.getLogger(__name__)
+
+# Process-wide asyncio runtime. One event loop runs forever on a dedicated thread, so
+# connections, caches and background tasks outlive a single Streamlit rerun (Streamlit
+# re-executes app.py on every message, but imported modules like this one persist).
+
+# Connection pool settings for the shared Groq HTTP session
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "30"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+_shutdown_hooks = []
+_http_sessions = {}
+
+def get_loop():
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="event-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+def submit(coro):
+    # Thread-safe: schedule a coroutine on the background loop, returns a concurrent.futures.Future
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout=None):
+    # Blocking helper for synchronous callers such as the Streamlit script thread
+    return submit(coro).result(timeout)
+
+def iterate(agen):
+    # Consume an async generator running on the background loop from synchronous code
+    try:
+        while True:
+            try:
+                yield run(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        run(agen.aclose())
+
+def get_http_session():
+    # One keep-alive session (and connection pool) per event loop; with the background
+    # loop that means one per process. aiohttp sessions cannot be shared across loops.
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT),
+        )
+        _http_sessions[loop] = session
+    return session
+
+async def close_http_session():
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+def register_shutdown_hook(hook):
+    # Hooks may be plain callables or coroutine functions (run on the background loop)
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+
+def shutdown():
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    for hook in reversed(_shutdown_hooks):
+        try:
+            if asyncio.iscoroutinefunction(hook):
+                if loop is not None and loop.is_running():
+                    asyncio.run_coroutine_threadsafe(hook(), loop).result(SHUTDOWN_TIMEOUT)
+            else:
+                hook()
+        except Exception as e:
+            logger.error(f"Shutdown hook {getattr(hook, '__name__', hook)} failed: {str(e)}")
+    if loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(SHUTDOWN_TIMEOUT)
+        loop.close()
+
+register_shutdown_hook(close_db)
+register_shutdown_hook(close_http_session)
+atexit.register(shutdown)
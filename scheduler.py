@@ -0,0 +1,191 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# Client-side scheduler for Groq calls. Every request waits for a slot, granted in
+# priority order once all of these allow it:
+#   - token buckets for requests and tokens per minute (the provider's rate limits)
+#   - an AIMD concurrency limit: +1/limit per success, halved on 429/503/timeouts
+#   - a pause after a 429 that carried Retry-After
+# Callers retry throttled or failed requests with jittered exponential backoff.
+
+# Off (0) by default: AIMD and Retry-After already adapt to whatever the key allows.
+# Set them to the key's limits to stay under them proactively, e.g. 30 and 6000 for
+# the free tier of llama-3.1-8b-instant.
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "0"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "0"))
+GROQ_CONCURRENCY_INITIAL = float(os.getenv("GROQ_CONCURRENCY_INITIAL", "8"))
+GROQ_CONCURRENCY_MIN = float(os.getenv("GROQ_CONCURRENCY_MIN", "1"))
+GROQ_CONCURRENCY_MAX = float(os.getenv("GROQ_CONCURRENCY_MAX", "32"))
+# At most one multiplicative decrease per this many seconds (one burst = one signal)
+GROQ_DECREASE_COOLDOWN = float(os.getenv("GROQ_DECREASE_COOLDOWN", "1"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "20"))
+
+# Lower runs first: finishing in-progress turns beats starting new ones
+STAGE_PRIORITIES = {
+    "response": 0,
+    "booking_response": 0,
+    "routing": 1,
+    "tool_selection": 1,
+    "intent": 2,
+}
+DEFAULT_PRIORITY = 1
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean the provider is overloaded, so the concurrency limit backs off
+CONGESTION_STATUSES = {429, 503}
+
+def parse_retry_after(value):
+    # Retry-After is either delta-seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, GROQ_BACKOFF_MAX)
+    # "Equal jitter": half fixed, half random, so retries spread without collapsing to 0
+    delay = min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        # Seconds until `amount` is available (requests above capacity wait for a full bucket)
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount, now):
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+
+class Slot:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.outcome = None
+
+    def succeeded(self):
+        self.outcome = "success"
+
+    def failed(self, status=None, retry_after=None):
+        self.outcome = "congestion" if status is None or status in CONGESTION_STATUSES else "failure"
+        if status == 429 and retry_after:
+            self.scheduler.pause(retry_after)
+
+class GroqScheduler:
+    def __init__(self):
+        self.requests = TokenBucket(GROQ_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(GROQ_TOKENS_PER_MINUTE)
+        self.limit = GROQ_CONCURRENCY_INITIAL
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.timer = None
+        self.stats = {"dispatched": 0, "throttled": 0, "retries": 0, "queue_seconds": 0.0}
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _dispatch(self):
+        self.timer = None
+        now = time.monotonic()
+        while self.waiters and self.in_flight < max(1, int(self.limit)):
+            _, _, cost, future = self.waiters[0]
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            wait = max(self.paused_until - now, self.requests.delay(1, now), self.tokens.delay(cost, now))
+            if wait > 0:
+                # Strict priority: lower-priority waiters do not overtake a throttled head
+                self.timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self.waiters)
+            self.requests.take(1, now)
+            self.tokens.take(cost, now)
+            self.in_flight += 1
+            self.stats["dispatched"] += 1
+            future.set_result(None)
+
+    def _wake(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self._dispatch()
+
+    def _release(self, outcome):
+        self.in_flight -= 1
+        now = time.monotonic()
+        if outcome == "success":
+            self.limit = min(GROQ_CONCURRENCY_MAX, self.limit + 1 / self.limit)
+        elif outcome == "congestion":
+            self.stats["throttled"] += 1
+            if now - self.last_decrease >= GROQ_DECREASE_COOLDOWN:
+                self.limit = max(GROQ_CONCURRENCY_MIN, self.limit / 2)
+                self.last_decrease = now
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, stage, cost):
+        # cost: estimated prompt + completion tokens for the token bucket
+        future = asyncio.get_running_loop().create_future()
+        entry = (STAGE_PRIORITIES.get(stage, DEFAULT_PRIORITY), next(self.sequence), cost, future)
+        heapq.heappush(self.waiters, entry)
+        queued_at = time.monotonic()
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(None)
+            raise
+        self.stats["queue_seconds"] += time.monotonic() - queued_at
+        slot = Slot(self)
+        try:
+            yield slot
+        finally:
+            self._release(slot.outcome)
+
+    def snapshot(self):
+        return dict(self.stats, limit=round(self.limit, 2), in_flight=self.in_flight, queued=len(self.waiters))
+
+# One scheduler per event loop (futures and timers are bound to a loop); with the
+# background loop that means one per process.
+_schedulers = {}
+
+def get_scheduler():
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = GroqScheduler()
+    return scheduler
+
+def scheduler_stats():
+    return get_scheduler().snapshot()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import uuid
+import weakref
+from aiohttp import web, WSMsgType
+from app import logger, process_input_stream, WELCOME_MESSAGE
+from runtime import close_http_session
+from data.db import bootstrap_db, close_db, run_db
+from session_store import get_session_store, new_session
+from singleflight import singleflight_stats
+from llm_cache import llm_cache_stats
+from data.catalog import catalog_cache_stats
+from logging_setup import logging_stats
+from prefetch import prefetch_stats
+from router import router_stats
+from scheduler import scheduler_stats
+from metrics import render_prometheus
+
+# Headless chat API around process_input:
+#   POST /chat  {"session_id": "...", "message": "..."} -> {"session_id", "request_id", "response"}
+#   GET  /ws    WebSocket; send {"session_id", "message"}, receive
+#               {"type": "chunk", "content"} events followed by {"type": "done", ...}
+#   GET  /health
+#   GET  /metrics  Prometheus text format
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+
+# Turns of one conversation run one at a time; different conversations run concurrently
+_session_locks = weakref.WeakValueDictionary()
+
+def session_lock(session_id):
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _session_locks[session_id] = lock
+    return lock
+
+async def run_turn(store, session_id, user_input):
+    # Yields response chunks; the history is loaded before and saved after the turn
+    request_id = str(uuid.uuid4())
+    lock = session_lock(session_id)
+    async with lock:
+        session = await store.load(session_id) or new_session(WELCOME_MESSAGE)
+        session["messages"].append({"role": "user", "content": user_input})
+        chunks = []
+        async for chunk in process_input_stream(user_input, request_id, session["messages"], session["context"]):
+            chunks.append(chunk)
+            yield request_id, chunk
+        session["messages"].append({"role": "assistant", "content": "".join(chunks).strip()})
+        await store.save(session_id, session)
+
+def parse_request(payload):
+    message = (payload.get("message") or "").strip()
+    if not message:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "message is required"}), content_type="application/json")
+    return payload.get("session_id") or uuid.uuid4().hex, message
+
+async def handle_chat(request):
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "invalid JSON"}), content_type="application/json")
+    session_id, message = parse_request(payload)
+    request_id = None
+    chunks = []
+    async for request_id, chunk in run_turn(request.app["session_store"], session_id, message):
+        chunks.append(chunk)
+    return web.json_response({"session_id": session_id, "request_id": request_id, "response": "".join(chunks).strip()})
+
+async def handle_ws(request):
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            break
+        try:
+            session_id, message = parse_request(json.loads(msg.data))
+        except (json.JSONDecodeError, web.HTTPBadRequest):
+            await ws.send_json({"type": "error", "error": "expected {\"session_id\", \"message\"}"})
+            continue
+        request_id = None
+        async for request_id, chunk in run_turn(request.app["session_store"], session_id, message):
+            await ws.send_json({"type": "chunk", "content": chunk})
+        await ws.send_json({"type": "done", "session_id": session_id, "request_id": request_id})
+    return ws
+
+async def handle_metrics(request):
+    return web.Response(body=render_prometheus().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+async def handle_health(request):
+    return web.json_response({
+        "status": "ok",
+        "singleflight": singleflight_stats(),
+        "llm_cache": llm_cache_stats(),
+        "catalog_cache": catalog_cache_stats(),
+        "logging": logging_stats(),
+        "prefetch": prefetch_stats(),
+        "router": router_stats(),
+        # Requests are served on this loop, so this is the scheduler they go through
+        "scheduler": scheduler_stats(),
+    })
+
+async def on_startup(app):
+    await run_db(bootstrap_db)
+
+async def on_cleanup(app):
+    await app["session_store"].close()
+    await close_http_session()
+    close_db()
+
+def create_app(session_store=None):
+    app = web.Application()
+    app["session_store"] = session_store or get_session_store()
+    app.router.add_post("/chat", handle_chat)
+    app.router.add_get("/ws", handle_ws)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+if __name__ == "__main__":
+    logger.info(f"Starting FoodieSpot chat API on {API_HOST}:{API_PORT}")
+    web.run_app(create_app(), host=API_HOST, port=API_PORT)
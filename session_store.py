@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from context import ConversationContext
+from data.db import get_db, run_db
+
+# Conversation state kept outside st.session_state, so any replica can serve any
+# conversation and a restart does not lose it. Backends implement
+# async load(session_id) -> session | None, save(session_id, session) and close().
+#
+# A session is {"messages", "user_id", "context", "recent_inputs"}. It is stored in a
+# compact encoding: messages as [role_code, content] pairs, the context as a plain dict,
+# and only messages the context has not yet folded into its summary (plus a bounded tail).
+
+# "memory" (per process) or "mongo" (shared across replicas)
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+# Messages kept per session; older ones survive only in the context summary
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+# Duplicate-submission window: same input within this many seconds is ignored
+DEDUP_WINDOW_SECONDS = float(os.getenv("DEDUP_WINDOW_SECONDS", "2"))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "20"))
+SESSION_COLLECTION = os.getenv("SESSION_COLLECTION", "sessions")
+
+ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+def new_session(welcome_message):
+    return {
+        "messages": [{"role": "assistant", "content": welcome_message}],
+        "user_id": f"U{uuid.uuid4().hex[:8].upper()}",
+        "context": ConversationContext(),
+        "recent_inputs": [],
+    }
+
+def _input_hash(user_input):
+    return hashlib.sha1(" ".join(user_input.split()).lower().encode("utf-8")).hexdigest()[:16]
+
+def is_duplicate_input(session, user_input, now=None):
+    now = time.time() if now is None else now
+    digest = _input_hash(user_input)
+    return any(entry[0] == digest and now - entry[1] <= DEDUP_WINDOW_SECONDS for entry in session["recent_inputs"])
+
+def record_input(session, user_input, now=None):
+    # Bounded by count and by age, unlike the old ever-growing processed_requests set
+    now = time.time() if now is None else now
+    recent = [entry for entry in session["recent_inputs"] if now - entry[1] <= DEDUP_WINDOW_SECONDS]
+    recent.append([_input_hash(user_input), now])
+    session["recent_inputs"] = recent[-DEDUP_MAX_ENTRIES:]
+
+def compact_session(session):
+    # Drop the oldest messages beyond the cap, as long as the context has folded them
+    excess = len(session["messages"]) - SESSION_MAX_MESSAGES
+    if excess > 0:
+        dropped = session["context"].drop_prefix(excess)
+        del session["messages"][:dropped]
+    return session
+
+def encode_session(session):
+    compact_session(session)
+    return {
+        "m": [[ROLE_CODES.get(msg["role"], msg["role"]), msg["content"]] for msg in session["messages"]],
+        "u": session["user_id"],
+        "c": session["context"].to_dict(),
+        "r": session["recent_inputs"],
+    }
+
+def decode_session(data):
+    return {
+        "messages": [{"role": ROLE_NAMES.get(role, role), "content": content} for role, content in data["m"]],
+        "user_id": data["u"],
+        "context": ConversationContext.from_dict(data.get("c", {})),
+        "recent_inputs": [list(entry) for entry in data.get("r", [])],
+    }
+
+class MemorySessionStore:
+    def __init__(self, ttl=SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.saves = 0
+
+    async def load(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.sessions[session_id]
+                return None
+        return decode_session(data)
+
+    async def save(self, session_id, session):
+        data = encode_session(session)
+        with self.lock:
+            self.sessions[session_id] = (data, time.monotonic() + self.ttl)
+            self.saves += 1
+            if self.saves % 1000 == 0:
+                now = time.monotonic()
+                for expired in [key for key, (_, expires_at) in self.sessions.items() if expires_at < now]:
+                    del self.sessions[expired]
+
+    async def close(self):
+        pass
+
+class MongoSessionStore:
+    # Shared across replicas; a TTL index on expires_at removes idle sessions
+    def __init__(self, ttl=SESSION_TTL_SECONDS, collection_name=SESSION_COLLECTION):
+        self.ttl = ttl
+        self.collection_name = collection_name
+        self.indexed = False
+
+    def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self.indexed:
+            collection.create_index([("expires_at", 1)], expireAfterSeconds=0)
+            self.indexed = True
+        return collection
+
+    def _load(self, session_id):
+        doc = self._collection().find_one({"_id": session_id, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        return decode_session(doc["s"]) if doc else None
+
+    def _save(self, session_id, data):
+        self._collection().replace_one(
+            {"_id": session_id},
+            {"s": data, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)},
+            upsert=True
+        )
+
+    async def load(self, session_id):
+        return await run_db(self._load, session_id)
+
+    async def save(self, session_id, session):
+        await run_db(self._save, session_id, encode_session(session))
+
+    async def close(self):
+        pass
+
+def create_session_store(backend=SESSION_STORE_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "mongo":
+        return MongoSessionStore()
+    raise ValueError(f"Unknown session store backend: {backend}")
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_session_store():
+    # Process-wide store (this module is imported, so it survives Streamlit reruns)
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = create_session_store()
+        return _default_store
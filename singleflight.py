@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+# Request coalescing. While a call for a key is in flight, concurrent callers with the
+# same key await that one call instead of issuing their own, which flattens bursts of
+# identical Groq requests or catalog reads. Unlike the response cache, nothing is kept
+# once the call finishes; the next caller starts a fresh one.
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        # (event loop, key) -> task; tasks belong to one loop and cannot be awaited from another
+        self.calls = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+        with _groups_lock:
+            _groups[name] = self
+
+    def in_flight(self, key):
+        task = self.calls.get((asyncio.get_running_loop(), key))
+        return task is not None and not task.done()
+
+    async def do(self, key, fn, *args, **kwargs):
+        # fn(*args, **kwargs) is a coroutine function; its result (or exception) is shared
+        slot = (asyncio.get_running_loop(), key)
+        task = self.calls.get(slot)
+        if task is None or task.done():
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self.calls[slot] = task
+            task.add_done_callback(lambda done: self._forget(slot, done))
+        else:
+            self.stats["coalesced"] += 1
+        # Shielded, so a caller that gives up does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, slot, task):
+        if self.calls.get(slot) is task:
+            del self.calls[slot]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter has already gone
+            task.exception()
+
+    def snapshot(self):
+        total = self.stats["leaders"] + self.stats["coalesced"]
+        return dict(self.stats, in_flight=len(self.calls), coalesce_rate=self.stats["coalesced"] / total if total else 0.0)
+
+def singleflight_stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.snapshot() for group in groups}
+
+llm_flight = SingleFlight("llm")
+tool_flight = SingleFlight("tools")
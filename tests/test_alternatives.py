@@ -0,0 +1,28 @@
+import mongomock
+import pytest
+
+from data.alternatives import find_alternatives
+
+RESTAURANT = {"restaurant_id": "R1", "name": "FoodieSpot Midtown Italian", "location": "Midtown", "cuisine": "Italian"}
+
+@pytest.fixture
+def database():
+    database = mongomock.MongoClient().restaurant_bot
+    database.availability.insert_many([
+        {"restaurant_id": "R1", "table_id": table_id, "date_time": f"2025-05-20T{hour}:00:00Z",
+         "capacity": 4, "price": 8.0, "status": "available"}
+        for hour in (17, 18, 19, 20)
+        for table_id in ("T1", "T2", "T3")
+    ])
+    return database
+
+def times(options):
+    return [option["date_time"] for option in options if option["kind"] == "time"]
+
+def test_nearest_times_are_distinct(database):
+    options = find_alternatives(database, RESTAURANT, "2025-05-20T19:30:00Z", 2)
+    assert times(options) == ["2025-05-20T19:00:00Z", "2025-05-20T20:00:00Z", "2025-05-20T18:00:00Z"]
+
+def test_time_without_offset_is_utc(database):
+    options = find_alternatives(database, RESTAURANT, "2025-05-20T19:00:00", 2)
+    assert times(options) == ["2025-05-20T18:00:00Z", "2025-05-20T20:00:00Z", "2025-05-20T17:00:00Z"]
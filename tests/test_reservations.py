@@ -0,0 +1,70 @@
+import mongomock
+import pytest
+
+from data import catalog, db
+from router import RESERVATION_ID_PATTERN
+import tools
+
+TIME = "2025-05-20T19:00:00Z"
+
+@pytest.fixture
+def database(monkeypatch):
+    db.set_client(mongomock.MongoClient())
+    # mongomock has no topology (and no transactions)
+    monkeypatch.setattr(db, "supports_transactions", lambda: False)
+    catalog.invalidate()
+    database = db.get_db()
+    tables = [{"table_id": "T1", "capacity": 4, "price": 8.0}, {"table_id": "T2", "capacity": 2, "price": 4.0}]
+    database.restaurants.insert_one({
+        "restaurant_id": "R1", "name": "FoodieSpot Midtown Italian", "location": "Midtown",
+        "cuisine": "Italian", "seating_capacity": 6, "tables": tables,
+    })
+    database.availability.insert_many([
+        dict(restaurant_id="R1", table_id=table["table_id"], date_time=TIME, capacity=table["capacity"],
+             price=table["price"], status="available")
+        for table in tables
+    ])
+    yield database
+    catalog.invalidate()
+    db.set_client(None)
+
+def reservation_id(result):
+    assert result.startswith("Table reserved"), result
+    return RESERVATION_ID_PATTERN.findall(result)[-1].upper()
+
+def user_entry(database, user_id):
+    return database.users.find_one({"user_id": user_id})["reservations"][0]
+
+def test_resize_keeps_own_table_when_restaurant_is_full(database):
+    first = reservation_id(tools._reserve_table("R1", TIME, 4, "Ann", "+1555", "U1"))
+    second = reservation_id(tools._reserve_table("R1", TIME, 2, "Bob", "+1556", "U2"))
+    assert tools._reserve_table("R1", TIME, 2, "Cat", "+1557", "U3").startswith("No tables available")
+
+    assert tools._update_reservation(first, None, 2, "U1").startswith("Table reserved")
+    assert tools._update_reservation(second, TIME, 1, "U2").startswith("Table reserved")
+
+    assert user_entry(database, "U1")["table_id"] == "T1"
+    assert user_entry(database, "U1")["party_size"] == 2
+    assert user_entry(database, "U2")["table_id"] == "T2"
+    slots = {slot["table_id"]: slot for slot in database.availability.find({"restaurant_id": "R1"})}
+    assert (slots["T1"]["status"], slots["T1"]["reservation_id"]) == ("booked", first)
+    assert (slots["T2"]["status"], slots["T2"]["reservation_id"]) == ("booked", second)
+
+def test_resize_moves_to_smaller_free_table(database):
+    booking = reservation_id(tools._reserve_table("R1", TIME, 4, "Ann", "+1555", "U1"))
+
+    assert tools._update_reservation(booking, TIME, 2, "U1").startswith("Table reserved")
+
+    assert user_entry(database, "U1")["table_id"] == "T2"
+    slots = {slot["table_id"]: slot for slot in database.availability.find({"restaurant_id": "R1"})}
+    assert slots["T1"]["status"] == "available"
+    assert (slots["T2"]["status"], slots["T2"]["reservation_id"]) == ("booked", booking)
+
+def test_canceled_reservation_cannot_be_updated(database):
+    booking = reservation_id(tools._reserve_table("R1", TIME, 2, "Ann", "+1555", "U1"))
+    assert tools._cancel_reservation(booking) == "Reservation canceled."
+
+    assert tools._update_reservation(booking, TIME, 4, "U1") == "Reservation already canceled."
+
+    assert database.availability.count_documents({"restaurant_id": "R1", "status": "booked"}) == 0
+    assert database.reservations.find_one({"reservation_id": booking})["status"] == "canceled"
@@ -0,0 +1,50 @@
+import pytest
+
+from router import fast_route, guess_route
+
+RESTAURANTS = [
+    {"id": "R1", "name": "FoodieSpot Downtown French", "cuisine": "french", "location": "Downtown"},
+    {"id": "R4", "name": "FoodieSpot Midtown Italian", "cuisine": "italian", "location": "Midtown"},
+    {"id": "R5", "name": "FoodieSpot Midtown Mexican", "cuisine": "mexican", "location": "Midtown"},
+    {"id": "R8", "name": "FoodieSpot Riverside Japanese", "cuisine": "japanese", "location": "Riverside"},
+]
+
+@pytest.mark.parametrize("text, expected", [
+    ("Show me the menu for R4", {"tool": "get_menu", "parameters": {"restaurant_id": "R4"}}),
+    ("What's on the menu at the Riverside Japanese place?", {"tool": "get_menu", "parameters": {"restaurant_id": "R8"}}),
+    ("Cancel my reservation RES6AD4370230DCCD7367CB629F",
+     {"tool": "cancel_reservation", "parameters": {"reservation_id": "RES6AD4370230DCCD7367CB629F"}}),
+    ("Can you recommend an Italian restaurant in Midtown for 4 people?",
+     {"tool": "recommend_restaurant", "parameters": {"cuisine": "italian", "location": "Midtown", "party_size": 4}}),
+    ("Suggest somewhere Downtown", {"tool": "recommend_restaurant", "parameters": {"location": "Downtown", "party_size": 2}}),
+])
+def test_accepts_simple_requests(text, expected):
+    assert fast_route(text, RESTAURANTS) == expected
+
+@pytest.mark.parametrize("text", [
+    # Negated preferences
+    "Can you recommend something other than italian?",
+    "Recommend anything but Mexican",
+    "Suggest a place besides the Italian one",
+    "Recommend somewhere in Midtown, not Italian",
+    "I don't want Italian, recommend something",
+    "Recommend a restaurant, no Japanese please",
+    # Compound or stateful requests
+    "Show me the menu for R4 and recommend a Thai place",
+    "Recommend an Italian place and book it",
+    "Update my booking RES6AD4370230DCCD7367CB629F",
+    # Ambiguous or incomplete
+    "Show me the menu",
+    "Show me the menu at the Midtown place",
+    "Cancel my reservation",
+    "Cancel RES6AD4370230DCCD7367CB629F and RES6AD4375BD7933AAEC9A79FA2",
+    "Recommend Italian or Mexican food",
+    "Hello there",
+])
+def test_falls_back_to_the_llm(text):
+    assert fast_route(text, RESTAURANTS) is None
+
+def test_guess_route_allows_compound_phrasing():
+    assert guess_route("Show me the menu for R4 and also the specials", RESTAURANTS) == {
+        "tool": "get_menu", "parameters": {"restaurant_id": "R4"}
+    }
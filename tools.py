@@ -1,136 +1,172 @@
-from data.db import get_db
-from datetime import datetime
-
-async def reserve_table(restaurant_id, date_time, party_size, name, phone, user_id):
+from data.db import get_db, run_db, run_write
+from data import catalog, search
+from data.availability import claim_slot, release_slot
+from data.alternatives import find_alternatives, describe_alternative
+from singleflight import tool_flight
+from bson import ObjectId
+
+def new_reservation_id():
+    # ObjectIds are unique per process (random + counter), unlike a seconds timestamp
+    return f"RES{ObjectId()}".upper()
+
+def _no_table_message(db, restaurant, date_time, party_size):
+    alternatives = find_alternatives(db, restaurant, date_time, party_size)
+    if alternatives:
+        options = "; ".join(describe_alternative(option) for option in alternatives)
+        return f"No tables available at {restaurant['name']} for {int(party_size)} at {date_time}. Alternatives with free tables: {options}. Would you like one of these?"
+    return "No tables available. Try another time or location."
+
+def _reserve_table(restaurant_id, date_time, party_size, name, phone, user_id):
+    # Write path: claim slot, upsert user + push reservation, insert reservation record.
+    # Three round trips, inside one transaction where the deployment supports it.
     db = get_db()
     try:
-        restaurant = db.restaurants.find_one({"restaurant_id": restaurant_id})
+        restaurant = catalog.get_restaurant(restaurant_id)
         if not restaurant:
             return "Restaurant not found."
 
-        # Find available table
-        selected_table = None
-        for table in restaurant["tables"]:
-            for avail in table["availability"]:
-                if avail["date_time"] == date_time and avail["status"] == "available" and table["capacity"] >= int(party_size):
-                    selected_table = table
-                    break
-            if selected_table:
-                break
-
+        reservation_id = new_reservation_id()
+
+        def book(session):
+            # Atomically claim the smallest free table that fits the party
+            selected_table = claim_slot(db, restaurant_id, date_time, int(party_size), reservation_id, session)
+            if not selected_table:
+                return None
+
+            reservation_details = {
+                "reservation_id": reservation_id,
+                "restaurant_id": restaurant_id,
+                "restaurant_name": restaurant["name"],
+                "table_id": selected_table["table_id"],
+                "table_price": selected_table["price"],
+                "party_size": int(party_size),
+                "date_time": date_time,
+                "prebooked_meals": []
+            }
+            try:
+                # Create the user if needed and add the reservation in a single upsert
+                db.users.update_one(
+                    {"user_id": user_id},
+                    {
+                        "$setOnInsert": {"phone_number": phone, "email_id": f"{user_id.lower()}@example.com"},
+                        "$push": {"reservations": reservation_details}
+                    },
+                    upsert=True,
+                    session=session
+                )
+                # Add minimal reservation data to reservations collection
+                db.reservations.insert_one({
+                    "reservation_id": reservation_id,
+                    "user_id": user_id,
+                    "status": "confirmed"
+                }, session=session)
+            except Exception:
+                if session is None:
+                    # No transaction to roll back: give the claimed table back
+                    release_slot(db, restaurant_id, selected_table["table_id"], date_time, reservation_id)
+                raise
+            return selected_table
+
+        selected_table = run_write(book)
         if not selected_table:
-            other_restaurants = db.restaurants.find({"location": {"$ne": restaurant["location"]}, "tables.capacity": {"$gte": int(party_size)}})
-            other_restaurants_list = list(other_restaurants)
-            if len(other_restaurants_list) > 0:
-                alt = other_restaurants_list[0]
-                return f"No tables available at {restaurant['location']}. Try {alt['name']} at {alt['location']}?"
-            return "No tables available. Try another time or location."
-
-        table_price = selected_table["price"]
-        reservation_id = f"RES{int(datetime.now().timestamp())}"
-
-        # Check if user exists; if not, create a new user
-        user = db.users.find_one({"user_id": user_id})
-        if not user:
-            db.users.insert_one({
-                "user_id": user_id,
-                "phone_number": phone,
-                "email_id": f"{user_id.lower()}@example.com",
-                "reservations": []
-            })
-
-        # Add reservation details to the user's reservations array
-        reservation_details = {
-            "reservation_id": reservation_id,
-            "restaurant_id": restaurant_id,
-            "restaurant_name": restaurant["name"],
-            "table_id": selected_table["table_id"],
-            "table_price": table_price,
-            "party_size": int(party_size),
-            "date_time": date_time,
-            "prebooked_meals": []
-        }
-        db.users.update_one(
-            {"user_id": user_id},
-            {"$push": {"reservations": reservation_details}}
-        )
-
-        # Add minimal reservation data to reservations collection
-        db.reservations.insert_one({
-            "reservation_id": reservation_id,
-            "user_id": user_id,
-            "status": "confirmed"
-        })
-
-        # Update table availability
-        db.restaurants.update_one(
-            {"restaurant_id": restaurant_id, "tables.table_id": selected_table["table_id"]},
-            {"$set": {"tables.$.availability.$[avail].status": "booked"}},
-            array_filters=[{"avail.date_time": date_time}]
-        )
-
-        return f"Table reserved at {restaurant['name']}! Reservation ID: {reservation_id}. Table price: ${table_price:.2f}"
+            return _no_table_message(db, restaurant, date_time, party_size)
+        return f"Table reserved at {restaurant['name']}! Reservation ID: {reservation_id}. Table price: ${selected_table['price']:.2f}"
 
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def cancel_reservation(reservation_id):
+def _cancel_reservation(reservation_id):
     db = get_db()
     try:
-        reservation = db.reservations.find_one({"reservation_id": reservation_id})
-        if not reservation:
-            return "Reservation not found."
-
-        user_id = reservation["user_id"]
-        user = db.users.find_one({"user_id": user_id})
-        if not user:
-            return "User not found."
-
-        # Find the reservation in the user's reservations array
-        reservation_details = next((r for r in user["reservations"] if r["reservation_id"] == reservation_id), None)
-        if not reservation_details:
-            return "Reservation details not found in user profile."
-
-        # Update reservation status in reservations collection
-        db.reservations.update_one(
-            {"reservation_id": reservation_id},
-            {"$set": {"status": "canceled"}}
+        # The user document holds the booking details; fetch only the matching entry
+        user = db.users.find_one(
+            {"reservations.reservation_id": reservation_id},
+            {"_id": 0, "user_id": 1, "reservations": {"$elemMatch": {"reservation_id": reservation_id}}}
         )
-
-        # Update table availability in restaurants collection
-        db.restaurants.update_one(
-            {"restaurant_id": reservation_details["restaurant_id"], "tables.table_id": reservation_details["table_id"]},
-            {"$set": {"tables.$.availability.$[avail].status": "available"}},
-            array_filters=[{"avail.date_time": reservation_details["date_time"]}]
-        )
-
+        if not user:
+            return "Reservation not found."
+        reservation_details = user["reservations"][0]
+
+        def cancel(session):
+            # Update reservation status in reservations collection
+            result = db.reservations.update_one(
+                {"reservation_id": reservation_id, "status": {"$ne": "canceled"}},
+                {"$set": {"status": "canceled"}},
+                session=session
+            )
+            if result.matched_count == 0:
+                return False
+
+            # Release the table slot
+            release_slot(db, reservation_details["restaurant_id"], reservation_details["table_id"], reservation_details["date_time"], reservation_id, session)
+            return True
+
+        if not run_write(cancel):
+            return "Reservation already canceled."
         return "Reservation canceled."
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def update_reservation(reservation_id, date_time, party_size, user_id):
+def _update_reservation(reservation_id, date_time, party_size, user_id):
+    # Moves the booking in place (same reservation ID): claim the new slot, rewrite the
+    # user's reservation entry, then release the old slot. At an unchanged time the
+    # guest's own table is a candidate too, so a resize never needs a second free table.
     db = get_db()
     try:
-        user = db.users.find_one({"user_id": user_id})
+        user = db.users.find_one(
+            {"user_id": user_id, "reservations.reservation_id": reservation_id},
+            {"_id": 0, "reservations": {"$elemMatch": {"reservation_id": reservation_id}}}
+        )
         if not user:
-            return "User not found."
-
-        reservation_details = next((r for r in user["reservations"] if r["reservation_id"] == reservation_id), None)
-        if not reservation_details:
             return "Reservation not found in user profile."
+        reservation_details = user["reservations"][0]
 
-        # Cancel old reservation
-        await cancel_reservation(reservation_id)
-        # Reserve new table
-        result = await reserve_table(
-            reservation_details["restaurant_id"], date_time, party_size,
-            user["phone_number"], user["phone_number"], user_id
-        )
-        return result
+        restaurant_id = reservation_details["restaurant_id"]
+        restaurant = catalog.get_restaurant(restaurant_id)
+        if not restaurant:
+            return "Restaurant not found."
+        date_time = date_time or reservation_details["date_time"]
+        party_size = int(party_size or reservation_details["party_size"])
+
+        def move(session):
+            # A canceled booking has given its table back; it cannot be moved (False)
+            if not db.reservations.find_one({"reservation_id": reservation_id, "status": {"$ne": "canceled"}}, {"_id": 1}, session=session):
+                return False
+            selected_table = claim_slot(db, restaurant_id, date_time, party_size, reservation_id, session, include_own=True)
+            if not selected_table:
+                return None
+            kept_table = (selected_table["table_id"], date_time) == (reservation_details["table_id"], reservation_details["date_time"])
+
+            try:
+                db.users.update_one(
+                    {"user_id": user_id, "reservations.reservation_id": reservation_id},
+                    {"$set": {
+                        "reservations.$.table_id": selected_table["table_id"],
+                        "reservations.$.table_price": selected_table["price"],
+                        "reservations.$.party_size": party_size,
+                        "reservations.$.date_time": date_time
+                    }},
+                    session=session
+                )
+            except Exception:
+                if session is None and not kept_table:
+                    release_slot(db, restaurant_id, selected_table["table_id"], date_time, reservation_id)
+                raise
+
+            if not kept_table:
+                release_slot(db, restaurant_id, reservation_details["table_id"], reservation_details["date_time"], reservation_id, session)
+            return selected_table
+
+        selected_table = run_write(move)
+        if selected_table is False:
+            return "Reservation already canceled."
+        if not selected_table:
+            return _no_table_message(db, restaurant, date_time, party_size)
+        return f"Table reserved at {restaurant['name']}! Reservation ID: {reservation_id}. Table price: ${selected_table['price']:.2f}"
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def prebook_meal(reservation_id, meal_name, user_id):
+def _prebook_meal(reservation_id, meal_name, user_id):
     db = get_db()
     try:
         user = db.users.find_one({"user_id": user_id})
@@ -141,7 +177,7 @@ async def prebook_meal(reservation_id, meal_name, user_id):
         if not reservation_details:
             return "Reservation not found in user profile."
 
-        meal = db.menu.find_one({"name": {"$regex": meal_name, "$options": "i"}, "restaurant_id": reservation_details["restaurant_id"]})
+        meal = search.find_meal(db, reservation_details["restaurant_id"], meal_name)
         if not meal:
             return "Meal not found."
         if not meal["prebook_allowed"]:
@@ -149,7 +185,7 @@ async def prebook_meal(reservation_id, meal_name, user_id):
 
         # Update the user's reservations array with the prebooked meal
         db.users.update_one(
-            {"user_id": user_id, "reservations.reservation_id": reservation_id},
+            {"user_id": user_id, "reservations": {"$elemMatch": {"reservation_id": reservation_id}}},
             {"$push": {"reservations.$.prebooked_meals": meal["name"]}}
         )
 
@@ -157,13 +193,12 @@ async def prebook_meal(reservation_id, meal_name, user_id):
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def get_menu(restaurant_id):
-    db = get_db()
+def _get_menu(restaurant_id):
     try:
-        restaurant = db.restaurants.find_one({"restaurant_id": restaurant_id})
+        restaurant = catalog.get_restaurant(restaurant_id)
         if not restaurant:
             return "Restaurant not found."
-        menu_items = db.menu.find({"restaurant_id": restaurant_id})
+        menu_items = catalog.get_menu_items(restaurant_id)
         menu_text = ", ".join(
             f"{item['name']} ({item['category']}) - ${item['price']}"
             f"{' (Pre-bookable)' if item['prebook_allowed'] else ''}"
@@ -173,18 +208,36 @@ async def get_menu(restaurant_id):
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def recommend_restaurant(cuisine, location, party_size):
-    db = get_db()
+def _recommend_restaurant(cuisine, location, party_size):
     try:
-        restaurants = db.restaurants.find({
-            "cuisine": {"$regex": cuisine or "", "$options": "i"},
-            "location": {"$regex": location or "", "$options": "i"},
-            "tables.capacity": {"$gte": int(party_size)}
-        }).limit(3)
-        restaurants_list = list(restaurants)
+        restaurants_list = catalog.find_restaurants(cuisine, location, party_size, limit=3)
         if len(restaurants_list) == 0:
             return "No restaurants match your preferences. Try another cuisine or location."
         recs = [f"{r['name']} ({r['cuisine']}) at {r['location']}" for r in restaurants_list]
         return "Recommended restaurants: " + ", ".join(recs)
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+# Async entry points used by the app: the pymongo work runs on the DB thread pool
+# so the event loop stays free while queries are in flight.
+async def reserve_table(restaurant_id, date_time, party_size, name, phone, user_id):
+    return await run_db(_reserve_table, restaurant_id, date_time, party_size, name, phone, user_id)
+
+async def cancel_reservation(reservation_id):
+    return await run_db(_cancel_reservation, reservation_id)
+
+async def update_reservation(reservation_id, date_time, party_size, user_id):
+    return await run_db(_update_reservation, reservation_id, date_time, party_size, user_id)
+
+async def prebook_meal(reservation_id, meal_name, user_id):
+    return await run_db(_prebook_meal, reservation_id, meal_name, user_id)
+
+# Read-only tools are coalesced: concurrent identical lookups share one DB round trip
+async def get_menu(restaurant_id):
+    # The leader's lookup serves every caller under the key, so both use the same id
+    restaurant_id = search.normalize_restaurant_id(restaurant_id)
+    return await tool_flight.do(("get_menu", restaurant_id), run_db, _get_menu, restaurant_id)
+
+async def recommend_restaurant(cuisine, location, party_size):
+    key = ("recommend_restaurant", search.normalize(cuisine), search.normalize(location), search.normalize(party_size))
+    return await tool_flight.do(key, run_db, _recommend_restaurant, cuisine, location, party_size)